@@ -10,6 +10,9 @@
 import random
 import numpy 
 import array
+import time
+
+import teamcamp_io
 
 from deap import algorithms
 from deap import base
@@ -23,12 +26,40 @@ pop_size = 500
 tour_size = 3
 mutpb = 0.15 
 cxpb = 0.2
+adaptive_rates = False # Retune mutpb/cxpb each generation (teamcamp_adaptive.py)
+diversity_restarts = False # Shake up a collapsed population (teamcamp_diversity.py)
+
+# Fitness Weights:
+window_penalty = 50 # Per game outside a team's arrival/departure window
+facility_penalty = 5 # Per facility change between a team's consecutive games
+use_rest_gaps = False # Score the time between each team's games (below)
+back_to_back_penalty = 10 # Per game played the hour right after another
+back_to_back_move_penalty = 25 # Extra if that next game is at another facility
+idle_hour_penalty = 1 # Per hour waited beyond a single hour gap
+day_split_penalty = 2 # Per extra day a team's games are spread over
+
+# Parallel Parameters:
+num_of_workers = 1 # Worker processes, 1 runs everything in this process
+shared_population = False # Keep population in shared memory for workers
+random_seed = None # Set to an integer for a reproducible run
+sparse_schedules = False # Store schedules as lists of games, for large camps
+numpy_engine = False # Run the GA on one population array (teamcamp_numpy.py)
+
+# Rescheduling Parameters:
+best_schedule_file = "BEST_SCHEDULE.json" # Best schedule saved here, None to skip
+previous_schedule_file = None # Saved schedule to warm start from, None for a fresh run
+cache_dir = ".teamcamp_cache" # Finished runs are cached here, None to disable
+
+# Output Parameters:
+event_file = None # JSONL event stream written here, "-" for stdout, None to skip
+quiet = False # Print nothing to stdout
 
 # Schedule Parameters:
 day1_start = 8 # Time in 24hr format by the hour
 day1_end = 23 # Time start of last game is this -1
 day2_start = 8
 day2_end = 23
+more_days = [] # (start, end) of any days after day 2, eg [(8, 20)]
 
 # Number of courts available in each location
 loc1_courts = 5 # Main courts located @ mercer
@@ -43,13 +74,201 @@ loc4_courts = 1 # Vineville Baptist Court
 
 num_of_teams = 0 # Default to 0, populate later
 num_of_conflicts = 0 # Incremented as we gain more conflicts
-tot_courts = loc1_courts + loc2_courts + loc3_courts + loc4_courts
-day1_slots = day1_end - day1_start
-day2_slots = day2_end - day2_start
-tot_slots = day1_slots + day2_slots
+
+########################################################################
+# Court and time slot layout derived from the schedule parameters.
+# Called once below, and again whenever those parameters are changed at
+# run time (eg from a config file, see teamcamp_cli.py).
+########################################################################
+def set_layout():
+    global tot_courts, day1_slots, day2_slots, day_hours, tot_slots
+    global slot_day, court_facility
+    tot_courts = loc1_courts + loc2_courts + loc3_courts + loc4_courts
+    day1_slots = day1_end - day1_start
+    day2_slots = day2_end - day2_start
+    day_hours = [(day1_start, day1_end), (day2_start, day2_end)] + \
+        [tuple(day) for day in more_days]
+    tot_slots = sum(end - start for start, end in day_hours)
+
+    # Day of every time slot, days are numbered from 0
+    slot_day = numpy.repeat(numpy.arange(len(day_hours)),
+                            [end - start for start, end in day_hours])
+
+    # Facility of every court, courts are numbered location by location
+    court_facility = numpy.array([0] * loc1_courts + [1] * loc2_courts
+                                 + [2] * loc3_courts + [3] * loc4_courts)
+
+set_layout()
 
 lvl_and_rank = [] # Store if V or JV, and rank of team
 glo_conf_list = [] # Store conflict list globally for CX to access
+team_slot_mask = [] # Per team bitmask of time slots it may play in
+allowed_slots = None # Same as a numpy bool array [team][TimeSegment]
+match_table = [] # Matchup score of every [team][opponent] pair
+
+# Globals describing the imported camp, copied into worker processes
+camp_globals = ("num_of_teams", "num_of_conflicts", "lvl_and_rank",
+                "glo_conf_list", "team_slot_mask", "allowed_slots",
+                "match_table")
+
+# User editable variables fitness depends on, copied along with them.
+# Workers started with spawn or forkserver import teamcamp afresh and
+# would otherwise score with the defaults.
+fitness_globals = ("window_penalty", "facility_penalty", "use_rest_gaps",
+                   "back_to_back_penalty", "back_to_back_move_penalty",
+                   "idle_hour_penalty", "day_split_penalty",
+                   "day1_start", "day1_end", "day2_start", "day2_end",
+                   "more_days", "loc1_courts", "loc2_courts",
+                   "loc3_courts", "loc4_courts")
+
+########################################################################
+# Snapshot of the camp globals set by read_schedule and the fitness
+# settings, and the matching setter used by worker processes that did
+# not read SCHEDULE.txt. The setter rebuilds the court/slot layout.
+########################################################################
+def camp_data():
+    return {name: globals()[name] for name in camp_globals + fitness_globals}
+
+def set_camp_data(data):
+    globals().update(data)
+    set_layout()
+
+########################################################################
+# Turn each team's start and end time into the set of time slots it may
+# play in, once, right after import, by teamcamp_io.team_slots().
+# team_slot_mask[team] holds bit x for every allowed slot x,
+# allowed_slots is the same as a bool array with row 0 (empty court
+# side) allowed everywhere.
+########################################################################
+def build_slot_masks(teams_to_schedule):
+    global team_slot_mask
+    global allowed_slots
+    allowed_slots = numpy.ones((num_of_teams + 1, tot_slots), dtype=bool)
+    for team in teams_to_schedule:
+        allowed_slots[team[1]] = teamcamp_io.team_slots(team[4], team[5], day_hours)
+    team_slot_mask = []
+    for row in allowed_slots:
+        mask = 0
+        for x in numpy.flatnonzero(row):
+            mask |= 1 << int(x)
+        team_slot_mask.append(mask)
+
+########################################################################
+# Count games outside of each team's allowed slots, for a whole
+# population at once. pop_array is an int array indexed
+# [Individual][TimeSegment][Court][TeamSide]; the team IDs gather from
+# allowed_slots in a single masked lookup. Returns one count per
+# individual.
+########################################################################
+def window_violations(pop_array):
+    slots = numpy.arange(pop_array.shape[1])[None, :, None, None]
+    return numpy.count_nonzero(~allowed_slots[pop_array, slots], axis=(1, 2, 3))
+
+########################################################################
+# Court in one time slot for a team's next game: a half filled game
+# against an opponent it has not played (played is the opponent bitset)
+# if there is one, otherwise the first empty court. None if neither.
+# Half games come first so the open games of a warm started schedule,
+# which can sit after empty courts, get completed. Schedules built from
+# scratch never have an empty court before a half game.
+########################################################################
+def pick_court(slot, played):
+    empty = None
+    for y, court in enumerate(slot):
+        if court[0] == 0:
+            if empty is None:
+                empty = y
+        elif court[1] == 0 and not (played >> court[0]) & 1:
+            return y
+    return empty
+
+########################################################################
+# Place one team's 3 games into a schedule, first fit from the earliest
+# time slot. If the team has a conflict, pass it as conflicting and the
+# two are placed together, alternating slots so they never play at the
+# same time. Teams are only paired with opponents they have not played,
+# and only in time slots inside their arrival/departure window.
+# Shared by generate_schedule, schedule_cx and warm starts.
+########################################################################
+def place_team(schedule, team, conflicting=0):
+    placing = [team, conflicting] if conflicting != 0 else [team]
+    remaining = [3] * len(placing)
+    played = [0] * len(placing) # Bitsets of opponents already faced
+    turn = 0
+    for x, slot in enumerate(schedule):
+        if remaining[-1] == 0:
+            # All games have been scheduled, break
+            break
+        # Skip slots outside the window of whoever is placed next
+        current = placing[turn]
+        if not (team_slot_mask[current] >> x) & 1:
+            continue
+        y = pick_court(slot, played[turn])
+        if y is None:
+            continue
+        if slot[y][0] == 0:
+            # Empty court, start a game here
+            slot[y][0] = current
+        else:
+            # Finish the team matchup here
+            slot[y][1] = current
+            played[turn] |= 1 << slot[y][0]
+        remaining[turn] -= 1
+        turn = (turn + 1) % len(placing)
+    return schedule
+
+########################################################################
+# Place every team in team_order into a schedule, in that order. A team
+# whose conflict was already placed alongside it is skipped.
+########################################################################
+def schedule_teams(schedule, team_order, conflict_list):
+    # List to hold already scheduled teams for conflict
+    already_scheduled = []
+    # Start iterating through team_order and populating schedule
+    for team in team_order:
+        # Team may have already been scheduled due to conflict, check list
+        if team not in already_scheduled: 
+            # Check if team is in our conflict list. If so, schedule its 
+            # conflict at the same time for simplicity
+            conflicting = 0
+            for match in conflict_list:
+                if team in match:
+                    if team == match[0]:
+                        conflicting = match[1]
+                    else:
+                        conflicting = match[0]
+            if (conflicting != 0):
+                already_scheduled.append(team)
+                already_scheduled.append(conflicting)
+            place_team(schedule, team, conflicting)
+    return schedule
+
+########################################################################
+# Merge two parent team orders into a child order for crossover. Switch
+# between the two, starting with first, each time taking the first team
+# not already in the child. Teams missing from both parents (no games
+# placed, eg a very tight window) go on the end so they are retried.
+########################################################################
+def merge_team_orders(first, second):
+    child_order = []
+    in_child = set()
+    orders = (first, second)
+    positions = [0, 0]
+    which_sch = 0
+    while positions[0] < len(first) or positions[1] < len(second):
+        order = orders[which_sch]
+        while positions[which_sch] < len(order):
+            team = order[positions[which_sch]]
+            positions[which_sch] += 1
+            if team not in in_child:
+                child_order.append(team)
+                in_child.add(team)
+                break
+        which_sch = 1 - which_sch
+    for team in range(1, num_of_teams + 1):
+        if team not in in_child:
+            child_order.append(team)
+    return child_order
 
 ########################################################################
 # Custom Crossover Function. 
@@ -89,45 +308,10 @@ def schedule_cx(schedule1, schedule2):
     # print("Sch1: \n", sch1_order)
     # print("Sch2: \n", sch2_order)
 
-    child1_order = []
-    child2_order = []
     # Switch between 1 and 2, and select the first teams that show up,
     # until we have a new team order to populate a schedule with
-    count = 0
-    which_sch = 1
-    while count < num_of_teams:
-        if which_sch == 1:
-            for x in sch1_order:
-                if x not in child1_order:
-                    child1_order.append(x)
-                    which_sch = 2
-                    count += 1
-                    break
-        elif which_sch == 2:
-            for x in sch2_order:
-                if x not in child1_order:
-                    child1_order.append(x)
-                    which_sch = 1
-                    count += 1
-                    break
-
-    count = 0
-    which_sch = 2
-    while count < num_of_teams:
-        if which_sch == 1:
-            for x in sch1_order:
-                if x not in child2_order:
-                    child2_order.append(x)
-                    which_sch = 2
-                    count += 1
-                    break
-        elif which_sch == 2:
-            for x in sch2_order:
-                if x not in child2_order:
-                    child2_order.append(x)
-                    which_sch = 1
-                    count += 1
-                    break
+    child1_order = merge_team_orders(sch1_order, sch2_order)
+    child2_order = merge_team_orders(sch2_order, sch1_order)
     # print("Child 1 New Order: \n", child1_order)
     # print("Child 2 New Order: \n", child2_order)
 
@@ -141,186 +325,9 @@ def schedule_cx(schedule1, schedule2):
     # Now iterate through schedule 1 and 2, changing their order
     # into our new team orders child1 and child2 respectively
 
-    # CHILD 1!!!
-    # List to hold already scheduled teams for conflict
-    already_scheduled = []
-    # Start iterating through team_order_list and populating schedule
-    for team in child1_order:
-        # Team may have already been scheduled due to conflict, check list
-        if team not in already_scheduled: 
-            # Check if team is in our conflict list. If so, schedule its 
-            # conflict at the same time for simplicity
-            conflicting = 0
-            for match in glo_conf_list:
-                if team in match:
-                    if team == match[0]:
-                        conflicting = match[1]
-                    else:
-                        conflicting = match[0]
-            if (conflicting != 0):
-                # print("Conflict exists for team: ", team, " and is: ", conflicting)
-                already_scheduled.append(team)
-                already_scheduled.append(conflicting)
-                # Schedule 3 games per conflicting team
-                rem_mat_team = 3
-                rem_mat_conf = 3
-                pick_t_or_c = 1
-                prev_played_team = []
-                prev_played_conf = []
-                # Find spots to place teams in the schedule
-                for x,i in enumerate(sch1):
-                    if rem_mat_conf == 0:
-                        # All 6 games have been scheduled, break
-                        break
-                    for y,j in enumerate(i):
-                        if j[0] == 0:
-                            #Empty slot, schedule game here
-                            if pick_t_or_c == 1:
-                                sch1[x][y][0] = team
-                                rem_mat_team -= 1
-                                pick_t_or_c = 2
-                                break
-                            elif pick_t_or_c == 2:
-                                sch1[x][y][0] = conflicting
-                                rem_mat_conf -= 1
-                                pick_t_or_c = 1
-                                break
-                        elif j[1] == 0:
-                            #Finish team matchup, schedule here
-                            if pick_t_or_c == 1:
-                                # Only match if team wasn't previously played
-                                if j[0] not in prev_played_team:
-                                    sch1[x][y][1] = team
-                                    # Keep track of previously played teams
-                                    prev_played_team.append(j[0])
-                                    rem_mat_team -= 1
-                                    pick_t_or_c = 2
-                                    break
-                            elif pick_t_or_c == 2:
-                                # Only match if conf wasn't previously played
-                                if j[0] not in prev_played_conf:
-                                    sch1[x][y][1] = conflicting
-                                    # Keep track of previously played teams
-                                    prev_played_conf.append(j[0])
-                                    rem_mat_conf -= 1
-                                    pick_t_or_c = 1
-                                    break
-            else:
-                # print("No conflict for team: ", team)
-                # No need to append to already_scheduled since singular
-                rem_mat_team = 3
-                prev_played = []
-                for x,i in enumerate(sch1):
-                    if rem_mat_team == 0:
-                        # All 3 games have been scheduled, break
-                        break
-                    for y, j in enumerate(i):
-                        if j[0] == 0:
-                            #Empty slot, schedule game here
-                            sch1[x][y][0] = team
-                            rem_mat_team -= 1
-                            break
-                        elif j[1] == 0:
-                            # Only match if previously unplayed team
-                            if j[0] not in prev_played:
-                                #Finish team matchup, schedule here
-                                sch1[x][y][1] = team
-                                prev_played.append(j[0])
-                                rem_mat_team -= 1
-                                break
-        # else:
-            # print("Team already scheduled: ", team)
-    # print("New Child 1: \n", sch1)
-
-
-    # CHILD 2!!!
-    # List to hold already scheduled teams for conflict
-    already_scheduled = []
-    # Start iterating through team_order_list and populating schedule
-    for team in child2_order:
-        # Team may have already been scheduled due to conflict, check list
-        if team not in already_scheduled: 
-            # Check if team is in our conflict list. If so, schedule its 
-            # conflict at the same time for simplicity
-            conflicting = 0
-            for match in glo_conf_list:
-                if team in match:
-                    if team == match[0]:
-                        conflicting = match[1]
-                    else:
-                        conflicting = match[0]
-            if (conflicting != 0):
-                # print("Conflict exists for team: ", team, " and is: ", conflicting)
-                already_scheduled.append(team)
-                already_scheduled.append(conflicting)
-                # Schedule 3 games per conflicting team
-                rem_mat_team = 3
-                rem_mat_conf = 3
-                pick_t_or_c = 1
-                prev_played_team = []
-                prev_played_conf = []
-                # Find spots to place teams in the schedule
-                for x,i in enumerate(sch2):
-                    if rem_mat_conf == 0:
-                        # All 6 games have been scheduled, break
-                        break
-                    for y,j in enumerate(i):
-                        if j[0] == 0:
-                            #Empty slot, schedule game here
-                            if pick_t_or_c == 1:
-                                sch2[x][y][0] = team
-                                rem_mat_team -= 1
-                                pick_t_or_c = 2
-                                break
-                            elif pick_t_or_c == 2:
-                                sch2[x][y][0] = conflicting
-                                rem_mat_conf -= 1
-                                pick_t_or_c = 1
-                                break
-                        elif j[1] == 0:
-                            #Finish team matchup, schedule here
-                            if pick_t_or_c == 1:
-                                # Only match if team wasn't previously played
-                                if j[0] not in prev_played_team:
-                                    sch2[x][y][1] = team
-                                    # Keep track of previously played teams
-                                    prev_played_team.append(j[0])
-                                    rem_mat_team -= 1
-                                    pick_t_or_c = 2
-                                    break
-                            elif pick_t_or_c == 2:
-                                # Only match if conf wasn't previously played
-                                if j[0] not in prev_played_conf:
-                                    sch2[x][y][1] = conflicting
-                                    # Keep track of previously played teams
-                                    prev_played_conf.append(j[0])
-                                    rem_mat_conf -= 1
-                                    pick_t_or_c = 1
-                                    break
-            else:
-                # print("No conflict for team: ", team)
-                # No need to append to already_scheduled since singular
-                rem_mat_team = 3
-                prev_played = []
-                for x,i in enumerate(sch2):
-                    if rem_mat_team == 0:
-                        # All 3 games have been scheduled, break
-                        break
-                    for y, j in enumerate(i):
-                        if j[0] == 0:
-                            #Empty slot, schedule game here
-                            sch2[x][y][0] = team
-                            rem_mat_team -= 1
-                            break
-                        elif j[1] == 0:
-                            # Only match if previously unplayed team
-                            if j[0] not in prev_played:
-                                #Finish team matchup, schedule here
-                                sch2[x][y][1] = team
-                                prev_played.append(j[0])
-                                rem_mat_team -= 1
-                                break
-    # print("New Child 2: \n", sch2)
+    # CHILD 1 and 2
+    schedule_teams(sch1, child1_order, glo_conf_list)
+    schedule_teams(sch2, child2_order, glo_conf_list)
 
     return sch1, sch2
     # Extract sequence of teams from both parent schedules. To generate
@@ -355,137 +362,188 @@ def schedule_mut(schedule):
     # print("After MUT: \n", mutating_local)
     return mutating_local,
 
+########################################################################
+# Score of team playing opponent, from team's point of view. +5 if it's
+# an exact level match, +2 if it's only one rank above or below.
+# lvl_and_rank[i-1][0] = v or jv, lvl_and_rank[i-1][1] = rank
+########################################################################
+def matchup_score(team, opponent):
+    return teamcamp_io.matchup_score(lvl_and_rank, team, opponent)
+
+########################################################################
+# Precompute matchup_score for every pair of teams, once per import.
+# match_table[team][opponent], row and column 0 are unused.
+########################################################################
+def build_match_table():
+    global match_table
+    match_table = [[0] * (num_of_teams + 1) for i in range(num_of_teams + 1)]
+    for team in range(1, num_of_teams + 1):
+        for opponent in range(1, num_of_teams + 1):
+            match_table[team][opponent] = matchup_score(team, opponent)
+
 ########################################################################
 # Our Fitness Function, determines how fit an individual is. Punish
 # unwanted but legal matchups lightly, and reward ideal matchups. 
 # Heavily punish illegal and incomplete schedules.
+#
+# The schedule is walked once. Two kinds of integer bitsets track
+# what has been seen: one per time slot with a bit for every team
+# already playing in it, and one per team with a bit for every opponent
+# it has faced. Double booking and rematches are then single bit tests.
+# Only the first 3 games of each team are scored.
 ########################################################################
-def calc_fitness(individual):
-    # Placeholder return for testing...
-    # total_fit = individual[0][0][0] + individual[0][0][1]
-    # return total_fit,
-    # Iterate through each individual team and calculate fitness. 
-    # Fitness is based on details below.
+def matchup_fitness(individual):
+    # Only the courts in use matter, pull them out as (slot, team1, team2)
+    games = [(x, court[0], court[1]) for x, slot in enumerate(individual)
+             for court in slot if court[0] or court[1]]
+    return score_games(games)
+
+########################################################################
+# Matchup scoring over a list of (slot, team1, team2) games in schedule
+# order (by slot, then court). Shared by the grid and the sparse game
+# list representations, see teamcamp_sparse.py.
+########################################################################
+def score_games(games):
     total_fit = 0
-    # If there are any incomplete matches, penalize
-    for i in individual:
-        for j in i:
-            if (j[0] != 0) and (j[1] ==  0):
+    games_left = [3] * (num_of_teams + 1)
+    opponents = [0] * (num_of_teams + 1)
+    current_slot = -1
+    playing = 0
+    for x, team1, team2 in games:
+        if x != current_slot:
+            current_slot = x
+            playing = 0
+        if team1 == 0 or team2 == 0:
+            # Incomplete match, penalize
+            total_fit -= 50
+        for team, opponent in ((team1, team2), (team2, team1)):
+            if team == 0 or games_left[team] == 0:
+                continue
+            games_left[team] -= 1
+            bit = 1 << team
+            if playing & bit:
+                # Big trouble: Same team scheduled to play at same time, penalize
                 total_fit -= 50
-    for i in range(1,num_of_teams+1,1):
-        # Find i's matchup and determine if it's a good match.
-        # +5 if it's an exact level match, +2 if it's only one
-        # above or below. lvl_and_rank[i-1][0] = v or jv
-        # lvl_and_rank[i-1][1] = rank
-        count = 3
-        # Keep track of all teams previously played. Penalize
-        # if we play the same team again. Reward if team has
-        # not been played yet. 
-        prev_played = []
-        for x in individual:
-            if count == 0:
-                break
-            # See if we already found a match in this time slot, same team
-            # cannot play at same time
-            in_this_time_slot = False
-            for y in x:
-                if y[0] == i:
-                    # Determine level and rank of i and y[1]
-                    if (lvl_and_rank[i-1][0] == lvl_and_rank[y[1]-1][0]):
-                        # Both V or JV, now check level matchup
-                        if (lvl_and_rank[i-1][1] == lvl_and_rank[y[1]-1][1]):
-                            # Perfect match, maximum reward
-                            total_fit += 5
-                        else:
-                            comp_lvl_1 = lvl_and_rank[i-1][1] 
-                            comp_lvl_2 = lvl_and_rank[y[1]-1][1]
-                            if abs(comp_lvl_1 - comp_lvl_2) <= 1:
-                                # Only one rank off, give small reward
-                                total_fit += 2
-                            else:
-                                # Bad match, but same level. Minor penalty
-                                total_fit -= 1
-                    else:
-                        if(lvl_and_rank[i-1][0] == 1):
-                            # i is the V team, check if its rank 3 and y is rank 1
-                            # Award 2 points if so, else minus 1 for poor match
-                            if (lvl_and_rank[i-1][1] == 3) and (lvl_and_rank[y[1]-1][1] == 1):
-                                total_fit += 1
-                            else:
-                                total_fit -= 5
-                        else:
-                            # y is V team, check if it's rank 3 and i is rank 1
-                            if (lvl_and_rank[i-1][1] == 1) and (lvl_and_rank[y[1]-1][1] == 3):
-                                total_fit += 1
-                            else:
-                                total_fit -= 5
-                    count -= 1
-                    if in_this_time_slot == False:
-                        # We have not run into this team during this time slot, set flag
-                        # to true and do nothing else.
-                        in_this_time_slot = True
-                    else:
-                        # Big trouble: Same team scheduled to play at same time, penalize
-                        total_fit -= 50
-                    # Check if opponent was played before, if so penalize
-                    if y[1] in prev_played:
-                        total_fit -= 50
-                    # Store opponent if it's not 0, for which penalty has already been applied
-                    elif y[1] != 0:
-                        prev_played.append(y[1])
-                        total_fit += 5
-                elif y[1] == i:
-                    # Determine level and rank of i and y[0]
-                    if (lvl_and_rank[i-1][0] == lvl_and_rank[y[0]-1][0]):
-                        # Both V or JV, now check level matchup
-                        if (lvl_and_rank[i-1][1] == lvl_and_rank[y[0]-1][1]):
-                            # Perfect match, maximum reward
-                            total_fit += 5
-                        else:
-                            comp_lvl_1 = lvl_and_rank[i-1][1] 
-                            comp_lvl_2 = lvl_and_rank[y[0]-1][1]
-                            if abs(comp_lvl_1 - comp_lvl_2) <= 1:
-                                # Only one rank off, give small reward
-                                total_fit += 2
-                            else:
-                                # Bad match, but same level. Minor penalty
-                                total_fit -= 1
-                    else:
-                        if(lvl_and_rank[i-1][0] == 1):
-                            # i is the V team, check if its rank 3 and y is rank 1
-                            # Award 2 points if so, else minus 1 for poor match
-                            if (lvl_and_rank[i-1][1] == 3) and (lvl_and_rank[y[0]-1][1] == 1):
-                                total_fit += 1
-                            else:
-                                total_fit -= 5
-                        else:
-                            # y is V team, check if it's rank 3 and i is rank 1
-                            if (lvl_and_rank[i-1][1] == 1) and (lvl_and_rank[y[0]-1][1] == 3):
-                                total_fit += 1
-                            else:
-                                total_fit -= 5
-                    count -= 1
-                    if in_this_time_slot == False:
-                        # We have not run into this team during this time slot, set flag
-                        # to true and do nothing else.
-                        in_this_time_slot = True
-                    else:
-                        # Big trouble: Same team scheduled to play at same time, penalize
-                        total_fit -= 50
-                    # Penalize if played before
-                    if y[0] in prev_played:
-                        total_fit -= 50
-                    # Store opponent if it's not 0, for which penalty has already been applied
-                    # Reward for unique matchup
-                    elif y[0] != 0:
-                        prev_played.append(y[1])
-                        total_fit += 5
-    return total_fit,
+            playing |= bit
+            if opponent == 0:
+                continue
+            total_fit += match_table[team][opponent]
+            if (opponents[team] >> opponent) & 1:
+                # Opponent was played before, penalize
+                total_fit -= 50
+            else:
+                # Reward for unique matchup
+                opponents[team] |= 1 << opponent
+                total_fit += 5
+    return total_fit
     # Psuedocode: Iterate through all the teams and figure out
     # the fitness of each. Sum up total fitness to calculate the
     # final schedule fitness. Staying at same facility, having
     # single hour gaps between games, and no scheduling conflicts
-    # will yield a higer fitness.
+    # will yield a higer fitness. Facility changes are counted in
+    # facility_changes().
+
+########################################################################
+# Every game of every team in a population, as four parallel arrays
+# (individual, team, slot, court), sorted by individual, then team, then
+# slot. Built once per batch and shared by the per team kernels below,
+# so each kernel is a few array operations over the games instead of a
+# scan of the grid per team.
+########################################################################
+def team_game_table(pop_array):
+    ind, slot, court, side = numpy.nonzero(pop_array)
+    team = pop_array[ind, slot, court, side]
+    return sort_game_table(ind, team, slot, court)
+
+def sort_game_table(ind, team, slot, court):
+    # Rows come in slot order per individual, a stable sort by
+    # (individual, team) keeps each team's games in slot order
+    order = numpy.argsort(ind * (num_of_teams + 1) + team, kind="stable")
+    return ind[order], team[order], slot[order], court[order]
+
+########################################################################
+# Count, per individual, how often a team plays consecutive games at
+# different facilities. Neighbouring rows of the table are a team's
+# consecutive games whenever individual and team match.
+########################################################################
+def facility_changes(table, size):
+    ind, team, slot, court = table
+    same_team = (ind[1:] == ind[:-1]) & (team[1:] == team[:-1])
+    facility = court_facility[court]
+    moved = same_team & (facility[1:] != facility[:-1])
+    return numpy.bincount(ind[1:][moved], minlength=size)
+
+########################################################################
+# Rest between games, from the same table. Each team's games are
+# already sorted, so one diff over the slot column gives the gap before
+# every game. Per individual, counts:
+#   back_to_back - games starting the hour right after the previous one
+#   moves        - those back to back games that are at another facility
+#   idle         - hours waited beyond a single hour gap on the same day
+#   splits       - times a team's next game is on a later day
+# The ideal is one hour off between games on the same day.
+########################################################################
+def rest_gaps(table, size):
+    ind, team, slot, court = table
+    same_team = (ind[1:] == ind[:-1]) & (team[1:] == team[:-1])
+    same_day = same_team & (slot_day[slot[1:]] == slot_day[slot[:-1]])
+    gap = slot[1:] - slot[:-1]
+    back = same_day & (gap == 1)
+    facility = court_facility[court]
+    moves = back & (facility[1:] != facility[:-1])
+    idle = numpy.where(same_day & (gap > 2), gap - 2, 0)
+    splits = same_team & ~same_day
+    later = ind[1:]
+    return (numpy.bincount(later[back], minlength=size),
+            numpy.bincount(later[moves], minlength=size),
+            numpy.bincount(later, weights=idle, minlength=size).astype(int),
+            numpy.bincount(later[splits], minlength=size))
+
+########################################################################
+# Penalties from the game table, shared with teamcamp_sparse. size is
+# the number of individuals the table was built from.
+########################################################################
+def table_penalties(table, size):
+    penalties = -facility_penalty * facility_changes(table, size)
+    if use_rest_gaps:
+        back_to_back, moves, idle, splits = rest_gaps(table, size)
+        penalties -= (back_to_back_penalty * back_to_back
+                      + back_to_back_move_penalty * moves
+                      + idle_hour_penalty * idle
+                      + day_split_penalty * splits)
+    return penalties
+
+########################################################################
+# Penalties computed on the whole population as one array, indexed
+# [Individual][TimeSegment][Court][TeamSide]. Returns one (negative)
+# fitness adjustment per individual.
+########################################################################
+def schedule_penalties(pop_array):
+    table = team_game_table(pop_array)
+    return (-window_penalty * window_violations(pop_array)
+            + table_penalties(table, len(pop_array)))
+
+########################################################################
+# Fitness of a batch of individuals, either a list of schedules or an
+# int array of them. The per team matchup scoring runs per schedule,
+# the array penalties run once for the whole batch. Returns a list of
+# fitness tuples, as toolbox.map(calc_fitness, ...) would.
+########################################################################
+def evaluate_population(population):
+    if len(population) == 0:
+        return []
+    pop_array = numpy.asarray(population)
+    if isinstance(population, numpy.ndarray):
+        population = pop_array.tolist()
+    penalties = schedule_penalties(pop_array)
+    return [(matchup_fitness(ind) + int(penalty),)
+            for ind, penalty in zip(population, penalties)]
+
+########################################################################
+# Fitness of a single individual, registered as the toolbox's evaluate.
+########################################################################
+def calc_fitness(individual):
+    return evaluate_population([individual])[0]
 
 ########################################################################
 # Used during initial blank schedule creation, creates one time
@@ -516,84 +574,7 @@ def generate_schedule(population, team_list, conflict_list):
         # print("Team Order List Is: ", team_order_list)
         # print("h is: ", h)
         # print("Conflict list: ", conflict_list)
-        # List to hold already scheduled teams for conflict
-        already_scheduled = []
-        # Helps us keep track of where to place teams
-        last_scheduled_ts = 0
-        last_scheduled_court = 0
-        last_scheduled_side = 0
-        # Start iterating through team_order_list and populating schedule
-        for team in team_order_list:
-            # Team may have already been scheduled due to conflict, check list
-            if team not in already_scheduled: 
-                # Check if team is in our conflict list. If so, schedule its 
-                # conflict at the same time for simplicity
-                conflicting = 0
-                for match in conflict_list:
-                    if team in match:
-                        if team == match[0]:
-                            conflicting = match[1]
-                        else:
-                            conflicting = match[0]
-                if (conflicting != 0):
-                    # print("Conflict exists for team: ", team, " and is: ", conflicting)
-                    already_scheduled.append(team)
-                    already_scheduled.append(conflicting)
-                    # Schedule 3 games per conflicting team
-                    rem_mat_team = 3
-                    rem_mat_conf = 3
-                    pick_t_or_c = 1
-                    # Find spots to place teams in the schedule
-                    for i in scheduled_pop[h]:
-                        if rem_mat_conf == 0:
-                            # All 6 games have been scheduled, break
-                            break
-                        for j in i:
-                            if j[0] == 0:
-                                #Empty slot, schedule game here
-                                if pick_t_or_c == 1:
-                                    j[0] = team
-                                    rem_mat_team -= 1
-                                    pick_t_or_c = 2
-                                    break
-                                elif pick_t_or_c == 2:
-                                    j[0] = conflicting
-                                    rem_mat_conf -= 1
-                                    pick_t_or_c = 1
-                                    break
-                            elif j[1] == 0:
-                                #Finish team matchup, schedule here
-                                if pick_t_or_c == 1:
-                                    j[1] = team
-                                    rem_mat_team -= 1
-                                    pick_t_or_c = 2
-                                    break
-                                elif pick_t_or_c == 2:
-                                    j[1] = conflicting
-                                    rem_mat_conf -= 1
-                                    pick_t_or_c = 1
-                                    break
-                else:
-                    # print("No conflict for team: ", team)
-                    # No need to append to already_scheduled since singular
-                    rem_mat_team = 3
-                    for i in scheduled_pop[h]:
-                        if rem_mat_team == 0:
-                            # All 3 games have been scheduled, break
-                            break
-                        for j in i:
-                            if j[0] == 0:
-                                #Empty slot, schedule game here
-                                j[0] = team
-                                rem_mat_team -= 1
-                                break
-                            elif j[1] == 0:
-                                #Finish team matchup, schedule here
-                                j[1] = team
-                                rem_mat_team -= 1
-                                break
-            # else:
-                # print("Team already scheduled: ", team)
+        schedule_teams(scheduled_pop[h], team_order_list, conflict_list)
     return scheduled_pop
 
 ########################################################################
@@ -609,105 +590,41 @@ def repair_schedule(schedule):
     # Was never used but could be helpful during expansion of program.
 
 ########################################################################
-# Main driver function.
+# Read the team file (SCHEDULE.txt by default). Returns the master list
+# of teams to schedule and the list of conflicting team pairs, and sets
+# num_of_teams, num_of_conflicts and lvl_and_rank for the GA functions.
 ########################################################################
-def main():
-    # Seed our random number generator
-    random.seed(random.SystemRandom().random())
-    # We start by importing SCHEDULE.txt with each team specifics.
-    print ("Importing team schedules")
-    teams_to_schedule = []  # Master list of teams to schedule
-    conflicting_teams = []  # Master list of teams that can't play at same time
-    general_population = [] # Holds our current population of schedules
-    with open("SCHEDULE.txt","r") as input_file:
-        team_number = 1
-        for line in input_file:
-            if(len(line.strip()) == 0):
-                continue
-            single_data_line=line.strip().split("-")
-            schedule_write = [] # Single line list to add to master list after setting
-
-            # String has been split. Check if we're adding 1 or 2 teams to the schedule.
-            # Teams with both a V and JV require two separate teams
-            # Each team needs a unique number, issued by team_number
-
-            if (single_data_line[1] == '1') or (single_data_line[1] == '2'):
-                # Single Team Case
-                if single_data_line[1] == '1':
-                    single_data_line[0] = single_data_line[0] + " V"
-                else:
-                    single_data_line[0] = single_data_line[0] + " JV"
-                # print (single_data_line[0], " has just a V or JV to play")
-                schedule_write.append(single_data_line[0]) # Team Name
-                schedule_write.append(team_number) # Unique Team Number
-                schedule_write.append(int(single_data_line[1])) # 1 for V, 2 for JV
-                schedule_write.append(int(single_data_line[3])) # Rank from 1-3
-                schedule_write.append(int(single_data_line[4])) # Start time
-                schedule_write.append(int(single_data_line[5])) # End time
-                # print ("Importing :", schedule_write)
-                teams_to_schedule.append(schedule_write)
-                cop_to_rank = [int(single_data_line[1]),int(single_data_line[3])]
-                lvl_and_rank.append(cop_to_rank[:]) # Specify copy
-            elif single_data_line[1] == '3':
-                # Varsity and JV team, [2] will be Y if they can play at the same time
-                if (single_data_line[2] == 'N') or (single_data_line[2] == 'n'):
-                    # Add team numbers to conflict pool
-                    add_conflict = []
-                    add_conflict.append(team_number)
-                    add_conflict.append(team_number+1)
-                    conflicting_teams.append(add_conflict)
-                    global num_of_conflicts
-                    num_of_conflicts += 1
-                # Parse rank structure for later addition to schedule_write
-                parsed_rank=single_data_line[3].strip().split(",")
-                # Create varsity team first
-                temp_name_string = single_data_line[0] + " V"
-                schedule_write.append(temp_name_string) # Team Name
-                schedule_write.append(team_number) # Unique Team Number
-                schedule_write.append(int(1)) # 1 for V, 2 for JV
-                schedule_write.append(int(parsed_rank[0])) # Rank from 1-3
-                schedule_write.append(int(single_data_line[4])) # Start time
-                schedule_write.append(int(single_data_line[5])) # End time
-                teams_to_schedule.append(schedule_write)
-                cop_to_rank = [int(1),int(parsed_rank[0])]
-                lvl_and_rank.append(cop_to_rank[:]) # Specify copy
-                # print ("Importing :", schedule_write)
-                team_number +=1 # Increment our team counter for special case
-                schedule_write = [] # Clear out our list to create 2nd JV team
-                temp_name_string = single_data_line[0] + " JV"
-                schedule_write.append(temp_name_string) # Team Name
-                schedule_write.append(team_number) # Unique Team Number
-                schedule_write.append(int(2)) # 1 for V, 2 for JV
-                schedule_write.append(int(parsed_rank[1])) # Rank from 1-3
-                schedule_write.append(int(single_data_line[4])) # Start time
-                schedule_write.append(int(single_data_line[5])) # End time
-                teams_to_schedule.append(schedule_write)
-                cop_to_rank = [int(2),int(parsed_rank[1])]
-                lvl_and_rank.append(cop_to_rank[:]) # Specify copy
-                # print ("Importing :", schedule_write)
-                # print (single_data_line[0], " has both V and JV to play")
-            else:
-                print ("Problem with SCHEDULE.txt, please fix team named:",single_data_line[0])
-                exit()
-            # store off current team number (also # of teams imported)
-            global num_of_teams
-            num_of_teams = team_number
-            # increment our team_number counter
-            team_number += 1
-    print("Import successful. Starting Genetic Algorithm.")
-    print("Number of teams to schedule: ", num_of_teams)
-    # We are done reading our file in...
-    # print("\n\nOur conflicting teams: ")
-    # print(conflicting_teams)
-    print("Our individual teams: ")
-    print(teams_to_schedule)
+def read_schedule(filename="SCHEDULE.txt"):
+    global num_of_teams
+    global num_of_conflicts
+    global lvl_and_rank
+    global glo_conf_list
+    try:
+        teams_to_schedule, conflicting_teams, lvl_and_rank = \
+            teamcamp_io.parse_schedule(filename)
+    except teamcamp_io.ScheduleError as err:
+        print(err)
+        exit()
+    num_of_teams = len(teams_to_schedule)
+    num_of_conflicts = len(conflicting_teams)
+    # Create global reference to conflicting_teams for CX access
+    glo_conf_list = conflicting_teams
+    build_slot_masks(teams_to_schedule)
+    build_match_table()
+    return teams_to_schedule, conflicting_teams
 
+########################################################################
+# Create the DEAP types and register our individual, population and
+# custom operators in a new toolbox.
+########################################################################
+def build_toolbox():
     # Time to set up our Genetic Algo. We have a single objective for fitness,
-    # which is to maximize it.
-    creator.create("FitnessMax", base.Fitness, weights=(1.0,))
+    # which is to maximize it. Only create the types once per process.
+    if not hasattr(creator, "Individual"):
+        creator.create("FitnessMax", base.Fitness, weights=(1.0,))
 
-    # Our individual is a list (with nested lists, needs not be specified)
-    creator.create("Individual", list, fitness=creator.FitnessMax)
+        # Our individual is a list (with nested lists, needs not be specified)
+        creator.create("Individual", list, fitness=creator.FitnessMax)
 
     # Initialize our toolbox
     toolbox = base.Toolbox()
@@ -722,20 +639,231 @@ def main():
 
     # Register custom evaluate, mutate, and crossover. Use tournament selection.
     toolbox.register("evaluate", calc_fitness)
+    toolbox.register("evaluate_population", evaluate_population)
     toolbox.register("mate", schedule_cx)
     toolbox.register("mutate", schedule_mut)
     toolbox.register("select", tools.selTournament, tournsize=tour_size)
-    
+    return toolbox
+
+########################################################################
+# Same generation loop as algorithms.eaSimple, evaluating each
+# generation as one batch with toolbox.evaluate_population, with a hook
+# called after every generation as on_generation(gen, population,
+# halloffame, logbook). If the hook returns True the run stops there,
+# which is how a running solve is cancelled. With a
+# teamcamp_adaptive.RateController as rates, cxpb and mutpb are retuned
+# after every generation and logged in the cxpb/mutpb columns.
+########################################################################
+def ea_simple(population, toolbox, cxpb, mutpb, ngen, stats=None,
+              halloffame=None, verbose=True, on_generation=None, rates=None):
+    logbook = tools.Logbook()
+    logbook.header = ["gen", "nevals"] + (stats.fields if stats else [])
+    if rates is not None:
+        import teamcamp_adaptive
+        logbook.header += ["cxpb", "mutpb"]
+        cxpb, mutpb = rates.cxpb, rates.mutpb
+        rate_columns = {"cxpb": cxpb, "mutpb": mutpb}
+    else:
+        rate_columns = {}
+
+    # Evaluate the individuals with an invalid fitness
+    invalid_ind = [ind for ind in population if not ind.fitness.valid]
+    fitnesses = toolbox.evaluate_population(invalid_ind)
+    for ind, fit in zip(invalid_ind, fitnesses):
+        ind.fitness.values = fit
+
+    if halloffame is not None:
+        halloffame.update(population)
+    record = stats.compile(population) if stats else {}
+    logbook.record(gen=0, nevals=len(invalid_ind), **record, **rate_columns)
+    if verbose:
+        print(logbook.stream)
+    if on_generation is not None and on_generation(0, population, halloffame, logbook):
+        return population, logbook
+
+    for gen in range(1, ngen + 1):
+        # Select and vary the next generation
+        offspring = toolbox.select(population, len(population))
+        if rates is not None:
+            offspring, parent, crossed, mutated, cx_time, mut_time = \
+                teamcamp_adaptive.var_and_timed(offspring, toolbox, cxpb, mutpb)
+        else:
+            offspring = algorithms.varAnd(offspring, toolbox, cxpb, mutpb)
+
+        # Evaluate the individuals with an invalid fitness
+        eval_start = time.process_time()
+        invalid_ind = [ind for ind in offspring if not ind.fitness.valid]
+        fitnesses = toolbox.evaluate_population(invalid_ind)
+        for ind, fit in zip(invalid_ind, fitnesses):
+            ind.fitness.values = fit
+        if rates is not None:
+            # Log the rates this generation used, then retune them
+            rate_columns = {"cxpb": cxpb, "mutpb": mutpb}
+            cxpb, mutpb = rates.observe(parent,
+                    [ind.fitness.values[0] for ind in offspring], crossed,
+                    mutated, cx_time, mut_time, time.process_time() - eval_start)
+
+        if halloffame is not None:
+            halloffame.update(offspring)
+        population[:] = offspring
+
+        record = stats.compile(population) if stats else {}
+        logbook.record(gen=gen, nevals=len(invalid_ind), **record, **rate_columns)
+        if verbose:
+            print(logbook.stream)
+        if on_generation is not None and on_generation(gen, population, halloffame, logbook):
+            break
+
+    return population, logbook
+
+########################################################################
+# Raise ValueError for engine settings that would be silently ignored:
+# adaptive_rates needs ea_simple or the numpy engine, and
+# diversity_restarts needs ea_simple or ea_parallel. sparse_schedules
+# always runs ea_simple.
+########################################################################
+def check_engine_settings():
+    if sparse_schedules:
+        return
+    pooled = shared_population or num_of_workers > 1
+    if adaptive_rates and pooled and not numpy_engine:
+        raise ValueError("adaptive_rates does not work with the worker pool "
+                         "engines, set num_of_workers = 1")
+    if diversity_restarts and (numpy_engine or shared_population):
+        raise ValueError("diversity_restarts does not work with numpy_engine "
+                         "or shared_population")
+
+########################################################################
+# Print progress unless quiet is set
+########################################################################
+def report(*args):
+    if not quiet:
+        print(*args)
+
+########################################################################
+# Save the best schedule to best_schedule_file, if set, for later warm
+# starts. Done for cached results too so the file always matches the
+# camp that was solved last.
+########################################################################
+def save_best(hof, teams_to_schedule, conflicting_teams):
+    if best_schedule_file is not None:
+        import teamcamp_reschedule
+        teamcamp_reschedule.save_schedule(best_schedule_file, hof[0],
+                teams_to_schedule, conflicting_teams, hof[0].fitness.values[0])
+
+########################################################################
+# Main driver function. on_generation is passed through to the
+# generation loop, see ea_simple(). With event_file set the run is also
+# written as a JSONL event stream (teamcamp_events.py), which replaces
+# the bulk dumps of the team list and best schedule on stdout.
+########################################################################
+def main(schedule_file="SCHEDULE.txt", on_generation=None):
+    global quiet
+    if event_file is None:
+        return run_main(schedule_file, on_generation, None)
+    import teamcamp_events
+    events = teamcamp_events.EventStream(event_file)
+    # Events on stdout leave no room for progress output
+    was_quiet = quiet
+    quiet = quiet or event_file == "-"
+    try:
+        return run_main(schedule_file, events.generation_hook(on_generation), events)
+    finally:
+        quiet = was_quiet
+        events.close()
+
+def run_main(schedule_file, on_generation, events):
+    check_engine_settings()
+    # Seed our random number generator. Worker processes derive their
+    # own streams from the same seed.
+    seed = random_seed
+    if seed is None:
+        seed = random.SystemRandom().randrange(2**32)
+    random.seed(seed)
+    # We start by importing SCHEDULE.txt with each team specifics.
+    report("Importing team schedules")
+    teams_to_schedule, conflicting_teams = read_schedule(schedule_file)
+    report("Import successful. Starting Genetic Algorithm.")
+    report("Number of teams to schedule: ", num_of_teams)
+    # We are done reading our file in...
+    # print("\n\nOur conflicting teams: ")
+    # print(conflicting_teams)
+    if events is not None:
+        events.emit("run", schedule_file=schedule_file, seed=seed,
+                    num_of_teams=num_of_teams, conflicts=len(conflicting_teams),
+                    tot_slots=tot_slots, tot_courts=tot_courts,
+                    num_of_gens=num_of_gens, pop_size=pop_size,
+                    tour_size=tour_size, cxpb=cxpb, mutpb=mutpb,
+                    adaptive_rates=adaptive_rates,
+                    diversity_restarts=diversity_restarts,
+                    num_of_workers=num_of_workers,
+                    shared_population=shared_population,
+                    sparse_schedules=sparse_schedules, numpy_engine=numpy_engine)
+    else:
+        report("Our individual teams: ")
+        report(teams_to_schedule)
+
+    toolbox = build_toolbox()
+    if previous_schedule_file is not None:
+        # Rescheduling: loaded first, the cache key depends on it
+        import teamcamp_reschedule
+        previous = teamcamp_reschedule.load_schedule(previous_schedule_file)
+    else:
+        previous = None
+    if cache_dir is not None:
+        # Reuse a previous run of the same camp with the same parameters,
+        # and from the same previous schedule when rescheduling
+        import teamcamp_cache
+        cache_keys = teamcamp_cache.make_keys(teams_to_schedule, conflicting_teams,
+                                              previous)
+        cache_state, cache_entry = teamcamp_cache.lookup(cache_dir, cache_keys)
+        if cache_state == "hit":
+            pop, log, hof = teamcamp_cache.cached_result(cache_entry)
+            report("Cached result found, best fitness: ", hof[0].fitness.values[0])
+            if events is not None:
+                events.emit("cached")
+                events.best(hof[0], hof[0].fitness.values[0])
+            else:
+                report("Best last iteration: \n", hof)
+            save_best(hof, teams_to_schedule, conflicting_teams)
+            return pop, log, hof
+    else:
+        cache_state, cache_entry = None, None
+
     pop = toolbox.population(n=pop_size)
     # References to our population are as follows:
     # pop[Individual][TimeSegment][Court][TeamSide]
     # eg pop[4][0][0][0] would reference the 5th individual schedule, first time
     # slot, first court, and the first team scheduled for that court.
-    generate_schedule(pop, teams_to_schedule, conflicting_teams)
-    print("Initial population successfully generated")
-    print("Population Size: ", pop_size, "   Number of Generations: ", num_of_gens)
-    print("Mutation Prob: ", mutpb, "   Crossover Prob: ", cxpb)
-    print("BEGIN GENETIC ALGORITHM")
+    if previous is not None:
+        # Rescheduling: start from the previous best schedule, only the
+        # teams that changed get placed again
+        affected = teamcamp_reschedule.warm_start_population(pop, previous,
+                teams_to_schedule, conflicting_teams)
+        report("Warm start from ", previous_schedule_file, "   Teams re-placed: ", affected)
+    elif cache_state == "near":
+        # Similar camp in the cache, start from its elites
+        import teamcamp_reschedule
+        affected = teamcamp_reschedule.warm_start_population(pop,
+                teamcamp_cache.entry_schedules(cache_entry),
+                teams_to_schedule, conflicting_teams)
+        report("Warm start from cached elites   Teams re-placed: ", affected)
+    elif sparse_schedules:
+        # Build the game lists directly, the grid is never walked
+        import teamcamp_sparse
+        toolbox = teamcamp_sparse.build_sparse_toolbox()
+        pop = teamcamp_sparse.generate_population(pop_size, conflicting_teams)
+    else:
+        generate_schedule(pop, teams_to_schedule, conflicting_teams)
+    if sparse_schedules and isinstance(pop[0], creator.Individual):
+        # Warm started on the grid, switch to game lists
+        import teamcamp_sparse
+        toolbox = teamcamp_sparse.build_sparse_toolbox()
+        pop = teamcamp_sparse.to_sparse(pop)
+    report("Initial population successfully generated")
+    report("Population Size: ", pop_size, "   Number of Generations: ", num_of_gens)
+    report("Mutation Prob: ", mutpb, "   Crossover Prob: ", cxpb)
+    report("BEGIN GENETIC ALGORITHM")
     # print("Member 1: \n", pop[0])
     hof = tools.HallOfFame(1)
 
@@ -745,15 +873,85 @@ def main():
     stats.register("std", numpy.std)
     stats.register("min", numpy.min)
     stats.register("max", numpy.max)
-
-    pop, log = algorithms.eaSimple(pop, toolbox, cxpb=cxpb, mutpb=mutpb, ngen=num_of_gens,
-            stats=stats, halloffame=hof, verbose=True)
-
-    print("Best last iteration: \n", hof)
-    print("Level and rank: \n", lvl_and_rank)
+    if adaptive_rates:
+        # Shift between crossover and mutation by fitness gained per CPU
+        # second
+        import teamcamp_adaptive
+        rates = teamcamp_adaptive.RateController(cxpb, mutpb)
+    else:
+        rates = None
+    if diversity_restarts:
+        # Watch schedule diversity, restart part of the population when
+        # it collapses. Needs the live population list, so only with
+        # the ea_simple and ea_parallel engines.
+        import teamcamp_diversity
+        stats = teamcamp_diversity.DiversityStatistics(stats)
+        if sparse_schedules:
+            def fresh():
+                return teamcamp_sparse.generate_population(1, conflicting_teams)[0]
+        else:
+            def fresh():
+                order = random.sample(range(1, num_of_teams+1), k=num_of_teams)
+                return schedule_teams(toolbox.individual(), order, conflicting_teams)
+        monitored = teamcamp_diversity.DiversityMonitor(toolbox, fresh).hook(on_generation)
+    else:
+        monitored = on_generation
+
+    if sparse_schedules:
+        # Game list individuals only run in this process. Switch back to
+        # the grid view for output, saving and caching.
+        pop, log = ea_simple(pop, toolbox, cxpb=cxpb, mutpb=mutpb, ngen=num_of_gens,
+                stats=stats, halloffame=hof, verbose=not quiet,
+                on_generation=monitored, rates=rates)
+        pop = teamcamp_sparse.to_grid(pop)
+        best = teamcamp_sparse.to_grid(hof)
+        hof = tools.HallOfFame(1)
+        hof.update(best)
+    elif numpy_engine:
+        # Population and fitness live in arrays for the whole run
+        import teamcamp_numpy
+        pop, log = teamcamp_numpy.ea_numpy(pop, cxpb=cxpb, mutpb=mutpb,
+                ngen=num_of_gens, tournsize=tour_size, halloffame=hof,
+                verbose=not quiet, seed=seed, on_generation=on_generation,
+                rates=rates)
+    elif shared_population:
+        # Workers evaluate and vary the population in shared memory,
+        # only fitness values are passed back to this process
+        import teamcamp_parallel
+        pop, log = teamcamp_parallel.ea_shared(pop, cxpb=cxpb, mutpb=mutpb,
+                ngen=num_of_gens, tournsize=tour_size, workers=num_of_workers,
+                halloffame=hof, verbose=not quiet,
+                team_data=camp_data(),
+                seed=seed, on_generation=on_generation)
+    elif num_of_workers > 1:
+        # Workers run crossover, mutation and evaluation on paired parents
+        import teamcamp_parallel
+        pop, log = teamcamp_parallel.ea_parallel(pop, toolbox, cxpb=cxpb,
+                mutpb=mutpb, ngen=num_of_gens, workers=num_of_workers,
+                stats=stats, halloffame=hof, verbose=not quiet,
+                team_data=camp_data(),
+                seed=seed, on_generation=monitored)
+    else:
+        pop, log = ea_simple(pop, toolbox, cxpb=cxpb, mutpb=mutpb, ngen=num_of_gens,
+                stats=stats, halloffame=hof, verbose=not quiet,
+                on_generation=monitored, rates=rates)
+
+    if events is not None:
+        events.best(hof[0], hof[0].fitness.values[0])
+    else:
+        report("Best last iteration: \n", hof)
+        report("Level and rank: \n", lvl_and_rank)
+    save_best(hof, teams_to_schedule, conflicting_teams)
+    if cache_dir is not None and len(log) == num_of_gens + 1:
+        # Only cache complete runs, not cancelled ones
+        teamcamp_cache.store(cache_dir, cache_keys, teams_to_schedule,
+                conflicting_teams, pop, hof, log)
     # print("Our individual teams: ")
     # print(teams_to_schedule)
     return pop, log, hof
 
 if __name__ == "__main__":
-    main()
+    # Run through the imported module so helper modules that import
+    # teamcamp share the same globals as main()
+    import teamcamp
+    teamcamp.main()
@@ -0,0 +1,112 @@
+##########################################################################
+# Adaptive crossover and mutation rates for teamcamp.py. schedule_cx
+# costs far more per call than schedule_mut, so fixed cxpb/mutpb spend
+# time on whichever operator happens to be favoured by hand tuning. The
+# RateController measures, every generation, how much fitness each
+# operator gained and how long it took (including the evaluations it
+# caused), and moves the probabilities toward the operator with the
+# most improvement per second. The sum cxpb + mutpb is kept at its
+# starting value, and each rate stays within [min_rate, max_rate].
+# Times are CPU time of this process (time.process_time).
+##########################################################################
+
+import random
+import time
+import numpy
+
+# Bounds for either rate
+adaptive_min_rate = 0.05
+adaptive_max_rate = 0.8
+# Weight of the latest generation in the running efficiency estimate
+adaptive_smoothing = 0.3
+
+class RateController:
+    def __init__(self, cxpb, mutpb, min_rate=None, max_rate=None, smoothing=None):
+        self.cxpb = cxpb
+        self.mutpb = mutpb
+        self.total = cxpb + mutpb
+        self.min_rate = adaptive_min_rate if min_rate is None else min_rate
+        self.max_rate = adaptive_max_rate if max_rate is None else max_rate
+        self.smoothing = adaptive_smoothing if smoothing is None else smoothing
+        # Running fitness gain per second of each operator
+        self.cx_rate = None
+        self.mut_rate = None
+
+    ####################################################################
+    # Record one generation. parent and child are the fitness of every
+    # offspring slot before and after variation, crossed and mutated
+    # flag which operators touched it. Times are in seconds. Returns the
+    # rates to use for the next generation.
+    ####################################################################
+    def observe(self, parent, child, crossed, mutated, cx_time, mut_time, eval_time):
+        parent = numpy.asarray(parent, dtype=float)
+        child = numpy.asarray(child, dtype=float)
+        crossed = numpy.asarray(crossed, dtype=bool)
+        mutated = numpy.asarray(mutated, dtype=bool)
+        # Only improvements count, a slot touched by both operators
+        # shares its gain between them
+        gain = numpy.maximum(child - parent, 0.0)
+        share = numpy.where(crossed & mutated, 0.5, 1.0)
+        cx_gain = float((gain * share)[crossed].sum())
+        mut_gain = float((gain * share)[mutated].sum())
+        # Evaluation time is split by how many evaluations each caused
+        cx_evals = float(share[crossed].sum())
+        mut_evals = float(share[mutated].sum())
+        evals = cx_evals + mut_evals
+        if evals > 0:
+            cx_time += eval_time * cx_evals / evals
+            mut_time += eval_time * mut_evals / evals
+        if cx_evals > 0 and cx_time > 0:
+            self.cx_rate = self.smooth(self.cx_rate, cx_gain / cx_time)
+        if mut_evals > 0 and mut_time > 0:
+            self.mut_rate = self.smooth(self.mut_rate, mut_gain / mut_time)
+        self.adjust()
+        return self.cxpb, self.mutpb
+
+    def smooth(self, current, latest):
+        if current is None:
+            return latest
+        return (1 - self.smoothing) * current + self.smoothing * latest
+
+    def adjust(self):
+        # Wait until both operators have been measured and one of them
+        # has produced something
+        if self.cx_rate is None or self.mut_rate is None:
+            return
+        if self.cx_rate + self.mut_rate <= 0:
+            return
+        share = self.cx_rate / (self.cx_rate + self.mut_rate)
+        cxpb = min(max(self.total * share, self.min_rate), self.max_rate)
+        mutpb = min(max(self.total - cxpb, self.min_rate), self.max_rate)
+        self.cxpb = cxpb
+        self.mutpb = mutpb
+
+########################################################################
+# algorithms.varAnd with each operator timed on its own. Makes the same
+# random draws in the same order as varAnd, so a seeded run with fixed
+# rates varies exactly the same way. Returns the offspring and what
+# RateController.observe needs apart from the child fitness: parent
+# fitness, crossed and mutated flags, crossover and mutation time.
+########################################################################
+def var_and_timed(population, toolbox, cxpb, mutpb):
+    offspring = [toolbox.clone(ind) for ind in population]
+    parent = [ind.fitness.values[0] for ind in offspring]
+    crossed = [False] * len(offspring)
+    mutated = [False] * len(offspring)
+
+    start = time.process_time()
+    for i in range(1, len(offspring), 2):
+        if random.random() < cxpb:
+            offspring[i - 1], offspring[i] = toolbox.mate(offspring[i - 1], offspring[i])
+            del offspring[i - 1].fitness.values, offspring[i].fitness.values
+            crossed[i - 1] = crossed[i] = True
+    cx_time = time.process_time() - start
+
+    start = time.process_time()
+    for i in range(len(offspring)):
+        if random.random() < mutpb:
+            offspring[i], = toolbox.mutate(offspring[i])
+            del offspring[i].fitness.values
+            mutated[i] = True
+    mut_time = time.process_time() - start
+    return offspring, parent, crossed, mutated, cx_time, mut_time
@@ -0,0 +1,192 @@
+##########################################################################
+# On disk result cache for teamcamp.py. Each finished run is stored as
+# one JSON file holding its best schedules (elites), their fitness and
+# the logbook. Entries are keyed by a hash of everything that decides
+# the result:
+#     layout key - court counts and the day/time slot layout
+#     camp key   - layout plus the parsed teams and conflict pairs
+#     full key   - camp plus the GA parameters, and for a rescheduling
+#                  run the previous schedule it starts from
+# A full key match returns the stored result straight away. Otherwise
+# the closest entry (same camp, then same layout) is used to warm start
+# the population from its elites. The least recently used entries are
+# evicted once the cache holds more than cache_max_entries.
+##########################################################################
+
+import hashlib
+import json
+import os
+
+from deap import creator
+from deap import tools
+
+import teamcamp
+
+# Number of best schedules kept per entry
+cache_elites = 10
+# Entries kept on disk before the oldest are evicted
+cache_max_entries = 50
+
+########################################################################
+# Hash a JSON-able value. sort_keys keeps the hash independent of dict
+# order.
+########################################################################
+def digest(value):
+    return hashlib.sha256(json.dumps(value, sort_keys=True).encode()).hexdigest()
+
+########################################################################
+# Everything about the current teamcamp settings that decides a run's
+# result, as nested dicts: layout inside camp inside the returned run
+# parameters. Team numbers are left out of the team list since they only
+# reflect file order, which is already captured by the list order.
+# previous is the loaded previous schedule of a rescheduling run.
+########################################################################
+def run_params(teams_to_schedule, conflict_list, previous=None):
+    layout = {"courts": [teamcamp.loc1_courts, teamcamp.loc2_courts,
+                         teamcamp.loc3_courts, teamcamp.loc4_courts],
+              "days": [list(day) for day in teamcamp.day_hours]}
+    camp = {"layout": layout,
+            "teams": [team[:1] + team[2:] for team in teams_to_schedule],
+            "conflicts": sorted(sorted(pair) for pair in conflict_list)}
+    params = {"camp": camp,
+              "num_of_gens": teamcamp.num_of_gens,
+              "pop_size": teamcamp.pop_size,
+              "tour_size": teamcamp.tour_size,
+              "cxpb": teamcamp.cxpb,
+              "mutpb": teamcamp.mutpb,
+              "adaptive_rates": teamcamp.adaptive_rates,
+              "diversity_restarts": teamcamp.diversity_restarts,
+              "random_seed": teamcamp.random_seed,
+              "num_of_workers": teamcamp.num_of_workers,
+              "shared_population": teamcamp.shared_population,
+              "sparse_schedules": teamcamp.sparse_schedules,
+              "numpy_engine": teamcamp.numpy_engine,
+              "weights": [teamcamp.window_penalty, teamcamp.facility_penalty,
+                          teamcamp.use_rest_gaps, teamcamp.back_to_back_penalty,
+                          teamcamp.back_to_back_move_penalty,
+                          teamcamp.idle_hour_penalty, teamcamp.day_split_penalty]}
+    if previous is not None:
+        params["previous"] = digest(previous)
+    return params
+
+########################################################################
+# The three cache keys for the current teamcamp settings
+########################################################################
+def make_keys(teams_to_schedule, conflict_list, previous=None):
+    params = run_params(teams_to_schedule, conflict_list, previous)
+    camp = params["camp"]
+    return {"layout": digest(camp["layout"]), "camp": digest(camp),
+            "full": digest(params)}
+
+def entry_path(cache_dir, full_key):
+    return os.path.join(cache_dir, full_key + ".json")
+
+def read_entry(path):
+    with open(path, "r") as input_file:
+        return json.load(input_file)
+
+########################################################################
+# Look up the current run. Returns ("hit", entry) for an exact match,
+# ("near", entry) for the most recently used entry sharing the camp or
+# at least the court/day layout, or (None, None). Entries that are
+# read get their modification time refreshed for LRU eviction.
+########################################################################
+def lookup(cache_dir, keys):
+    path = entry_path(cache_dir, keys["full"])
+    if os.path.exists(path):
+        os.utime(path)
+        return "hit", read_entry(path)
+    if not os.path.isdir(cache_dir):
+        return None, None
+    best = None
+    best_rank = None
+    for name in os.listdir(cache_dir):
+        if not name.endswith(".json"):
+            continue
+        path = os.path.join(cache_dir, name)
+        try:
+            entry = read_entry(path)
+        except (OSError, ValueError):
+            continue
+        if entry["keys"]["camp"] == keys["camp"]:
+            closeness = 2
+        elif entry["keys"]["layout"] == keys["layout"]:
+            closeness = 1
+        else:
+            continue
+        rank = (closeness, os.path.getmtime(path))
+        if best_rank is None or rank > best_rank:
+            best, best_rank = path, rank
+    if best is None:
+        return None, None
+    os.utime(best)
+    return "near", read_entry(best)
+
+########################################################################
+# Store a finished run and evict old entries. The elites are the best
+# distinct schedules from the hall of fame and final population.
+########################################################################
+def store(cache_dir, keys, teams_to_schedule, conflict_list, population, halloffame, logbook):
+    candidates = sorted(list(halloffame) + list(population),
+                        key=lambda ind: ind.fitness.values[0], reverse=True)
+    elites = []
+    seen = set()
+    for ind in candidates:
+        schedule = [[[int(team) for team in court] for court in slot] for slot in ind]
+        marker = json.dumps(schedule)
+        if marker in seen:
+            continue
+        seen.add(marker)
+        elites.append({"schedule": schedule, "fitness": ind.fitness.values[0]})
+        if len(elites) == cache_elites:
+            break
+    names = {team[1]: team[0] for team in teams_to_schedule}
+    entry = {"keys": keys,
+             "teams": teams_to_schedule,
+             "conflicts": [[names[a], names[b]] for a, b in conflict_list],
+             "elites": elites,
+             "log": [{key: (value if isinstance(value, int) else float(value))
+                      for key, value in record.items()} for record in logbook]}
+    os.makedirs(cache_dir, exist_ok=True)
+    # Write then rename so a reader never sees a half written entry
+    path = entry_path(cache_dir, keys["full"])
+    with open(path + ".tmp", "w") as output_file:
+        json.dump(entry, output_file)
+    os.replace(path + ".tmp", path)
+    evict(cache_dir)
+
+def evict(cache_dir, max_entries=None):
+    if max_entries is None:
+        max_entries = cache_max_entries
+    paths = [os.path.join(cache_dir, name) for name in os.listdir(cache_dir)
+             if name.endswith(".json")]
+    paths.sort(key=os.path.getmtime, reverse=True)
+    for path in paths[max_entries:]:
+        os.remove(path)
+
+########################################################################
+# Turn an entry's elites into saved schedules, in the format
+# teamcamp_reschedule.warm_start_population expects.
+########################################################################
+def entry_schedules(entry):
+    return [{"teams": entry["teams"], "conflicts": entry["conflicts"],
+             "schedule": elite["schedule"], "fitness": elite["fitness"]}
+            for elite in entry["elites"]]
+
+########################################################################
+# Rebuild main()'s return values (population, logbook, hall of fame)
+# from an exact cache hit. The population is the stored elites.
+########################################################################
+def cached_result(entry, hof_size=1):
+    pop = []
+    for elite in entry["elites"]:
+        ind = creator.Individual(elite["schedule"])
+        ind.fitness.values = (elite["fitness"],)
+        pop.append(ind)
+    hof = tools.HallOfFame(hof_size)
+    hof.update(pop)
+    log = tools.Logbook()
+    log.header = ["gen", "nevals", "avg", "std", "min", "max"]
+    for record in entry["log"]:
+        log.record(**record)
+    return pop, log, hof
@@ -0,0 +1,154 @@
+##########################################################################
+# Command line interface for teamcamp.py:
+#     python teamcamp_cli.py solve    [SCHEDULE.txt] [--config run.toml] ...
+#     python teamcamp_cli.py validate [SCHEDULE.txt] [--config run.toml]
+#     python teamcamp_cli.py bench    [SCHEDULE.txt] [--config run.toml] ...
+# A config is a TOML or JSON file setting any of the user editable
+# variables at the top of teamcamp.py (GA, fitness weights, court and
+# day layout, ...), see teamcamp_io.load_config. Values not in the
+# config keep their teamcamp.py defaults.
+#
+# validate only uses teamcamp_io and the standard library. numpy, deap
+# and teamcamp itself are imported inside the subcommands that run the
+# GA, so checking a camp file starts in a few tens of milliseconds.
+##########################################################################
+
+import argparse
+import sys
+import time
+
+import teamcamp_io
+
+########################################################################
+# Parameters for this run: teamcamp.py defaults updated by the config
+########################################################################
+def run_params(args):
+    params = teamcamp_io.user_params()
+    if args.config is not None:
+        try:
+            params.update(teamcamp_io.load_config(args.config, known=params))
+        except (OSError, ValueError) as err:
+            sys.exit("Bad config " + args.config + ": " + str(err))
+    return params
+
+########################################################################
+# Import teamcamp and apply the run parameters to it
+########################################################################
+def load_teamcamp(params):
+    import teamcamp
+    for name, value in params.items():
+        setattr(teamcamp, name, value)
+    teamcamp.set_layout()
+    return teamcamp
+
+def solve(args):
+    params = run_params(args)
+    if args.seed is not None:
+        params["random_seed"] = args.seed
+    if args.events is not None:
+        params["event_file"] = args.events
+    if args.quiet or args.events == "-":
+        params["quiet"] = True
+    teamcamp = load_teamcamp(params)
+    try:
+        teamcamp.check_engine_settings()
+    except ValueError as err:
+        sys.exit("Bad config: " + str(err))
+    pop, log, hof = teamcamp.main(args.schedule)
+    if not teamcamp.quiet:
+        print("Best fitness: ", hof[0].fitness.values[0])
+    return 0
+
+########################################################################
+# Parse the camp file and check it against the court/day layout. Exits
+# with 1 if the file can't be read or a problem was found.
+########################################################################
+def validate(args):
+    params = run_params(args)
+    try:
+        teams, conflicts, lvl_and_rank = teamcamp_io.parse_schedule(args.schedule)
+    except (OSError, teamcamp_io.ScheduleError) as err:
+        print(err)
+        return 1
+    day_hours, tot_courts = teamcamp_io.layout(params)
+    problems = teamcamp_io.check_schedule(teams, day_hours, tot_courts)
+    print("Teams: ", len(teams), "   Conflicting pairs: ", len(conflicts))
+    print("Courts: ", tot_courts, "   Time slots: ",
+          sum(end - start for start, end in day_hours))
+    print("Fitness bound: ", teamcamp_io.fitness_bound(lvl_and_rank))
+    for problem in problems:
+        print("Problem: ", problem)
+    return 1 if problems else 0
+
+########################################################################
+# Time the building blocks of a run on this camp: reading the file,
+# building the initial population, evaluating it as one batch and a
+# short quiet GA run with the configured engine.
+########################################################################
+def bench(args):
+    params = run_params(args)
+    params.update(quiet=True, event_file=None, cache_dir=None,
+                  best_schedule_file=None, previous_schedule_file=None)
+    if args.gens is not None:
+        params["num_of_gens"] = args.gens
+    if args.pop is not None:
+        params["pop_size"] = args.pop
+    start = time.perf_counter()
+    teamcamp = load_teamcamp(params)
+    import_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    teams, conflicts = teamcamp.read_schedule(args.schedule)
+    read_time = time.perf_counter() - start
+    toolbox = teamcamp.build_toolbox()
+    pop = toolbox.population(n=teamcamp.pop_size)
+    start = time.perf_counter()
+    teamcamp.generate_schedule(pop, teams, conflicts)
+    generate_time = time.perf_counter() - start
+    start = time.perf_counter()
+    teamcamp.evaluate_population(pop)
+    evaluate_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    pop, log, hof = teamcamp.main(args.schedule)
+    run_time = time.perf_counter() - start
+    evals = sum(log.select("nevals"))
+    print("Import:     ", round(import_time, 4), "s")
+    print("Read:       ", round(read_time, 4), "s")
+    print("Generate:   ", round(generate_time, 4), "s  for", teamcamp.pop_size,
+          "schedules")
+    print("Evaluate:   ", round(evaluate_time, 4), "s  ",
+          round(teamcamp.pop_size / evaluate_time), "evals/s")
+    print("Run:        ", round(run_time, 4), "s  ", len(log) - 1, "generations  ",
+          round(evals / run_time), "evals/s  best", hof[0].fitness.values[0])
+    return 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="teamcamp",
+            description="Basketball camp scheduling with a genetic algorithm")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_command(name, function, help_text):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("schedule", nargs="?", default="SCHEDULE.txt",
+                             help="team file (default SCHEDULE.txt)")
+        command.add_argument("--config", help="TOML or JSON run config")
+        command.set_defaults(function=function)
+        return command
+
+    command = add_command("solve", solve, "run the GA and save the best schedule")
+    command.add_argument("--seed", type=int, help="random seed")
+    command.add_argument("--events", help="JSONL event stream file, - for stdout")
+    command.add_argument("--quiet", action="store_true", help="print nothing")
+    add_command("validate", validate, "check a team file without solving")
+    command = add_command("bench", bench, "time population build, evaluation and a short run")
+    command.add_argument("--gens", type=int, help="generations (default from config)")
+    command.add_argument("--pop", type=int, help="population size (default from config)")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.function(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
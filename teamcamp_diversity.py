@@ -0,0 +1,219 @@
+##########################################################################
+# Diversity monitor for teamcamp.py. Tournament selection plus a
+# crossover that rebuilds children from merged team orders quickly fills
+# the population with copies of a few schedules, after which most
+# evaluations are spent on schedules already seen. Every generation the
+# monitor hashes each schedule and computes
+#     unique  - share of distinct schedules in the population
+#     entropy - Shannon entropy of the schedule counts, scaled to 0-1
+# (both logbook columns, see DiversityStatistics). When entropy stays
+# below diversity_threshold while the best fitness has not improved
+# for stall_generations, the population is shaken up in place, either
+#     "restart"     - replace restart_fraction of it with new random
+#                     schedules
+#     "hypermutate" - apply hypermutation_swaps team swaps to that share
+# The hall of fame elites and the current best individuals are never
+# replaced. Runs with the ea_simple and ea_parallel engines, which hand
+# on_generation the live population list; main() raises ValueError if
+# it is asked for with another engine.
+#
+# compare_runs() runs a camp with and without the monitor over several
+# seeds and reports the wall time saved to reach a target fitness.
+##########################################################################
+
+import math
+import random
+import time
+
+from collections import Counter
+
+import teamcamp
+
+# Normalized entropy counted as collapsed
+diversity_threshold = 0.5
+# Generations without a better best before a collapse is acted on
+stall_generations = 8
+# Generations to leave the population alone after acting
+restart_cooldown = 5
+restart_action = "restart" # "restart" or "hypermutate"
+restart_fraction = 0.2 # Share of the population replaced or mutated
+hypermutation_swaps = 5 # Team swaps per individual in a hypermutation burst
+
+########################################################################
+# Hash every schedule of a population. repr of the nested lists is one
+# C level walk per schedule, and works for grid and game list schedules.
+########################################################################
+def population_hashes(population):
+    return [hash(repr(ind)) for ind in population]
+
+########################################################################
+# (unique, entropy) of a list of schedule hashes
+########################################################################
+def diversity(hashes):
+    size = len(hashes)
+    counts = Counter(hashes)
+    if size < 2:
+        return 1.0, 1.0
+    entropy = -sum(count / size * math.log(count / size) for count in counts.values())
+    return len(counts) / size, entropy / math.log(size)
+
+class DiversityStatistics:
+    ####################################################################
+    # Wraps a deap Statistics so each compiled record also holds unique
+    # and entropy, and lists them in fields so they are in the logbook
+    # header and printed with the rest of the row.
+    ####################################################################
+    def __init__(self, stats):
+        self.stats = stats
+        self.fields = stats.fields + ["unique", "entropy"]
+
+    def compile(self, population):
+        record = self.stats.compile(population)
+        record["unique"], record["entropy"] = diversity(population_hashes(population))
+        return record
+
+class DiversityMonitor:
+    ####################################################################
+    # toolbox supplies mutate and evaluate_population. fresh() returns a
+    # new random schedule, needed for the "restart" action.
+    ####################################################################
+    def __init__(self, toolbox, fresh=None, action=None):
+        self.toolbox = toolbox
+        self.fresh = fresh
+        self.action = restart_action if action is None else action
+        self.best = None
+        self.stalled = 0
+        self.cooldown = 0
+        self.restarts = [] # Generations the population was shaken up
+        self.extra_evals = 0
+
+    ####################################################################
+    # Wrap an on_generation hook (or None) so the monitor runs first.
+    ####################################################################
+    def hook(self, on_generation=None):
+        def monitor(gen, population, halloffame, logbook):
+            self.observe(gen, population, halloffame, logbook)
+            if on_generation is not None:
+                return on_generation(gen, population, halloffame, logbook)
+            return False
+        return monitor
+
+    ####################################################################
+    # Reads entropy from the logbook record when the engine's stats were
+    # wrapped in DiversityStatistics, otherwise computes it.
+    ####################################################################
+    def observe(self, gen, population, halloffame, logbook):
+        record = logbook[-1]
+        if "entropy" not in record:
+            record["unique"], record["entropy"] = diversity(population_hashes(population))
+        entropy = record["entropy"]
+        best = max(ind.fitness.values[0] for ind in population)
+        if self.best is None or best > self.best:
+            self.best = best
+            self.stalled = 0
+        else:
+            self.stalled += 1
+        if self.cooldown > 0:
+            self.cooldown -= 1
+            return
+        if entropy < diversity_threshold and self.stalled >= stall_generations:
+            self.shake(population, halloffame)
+            self.restarts.append(gen)
+            self.cooldown = restart_cooldown
+            self.stalled = 0
+
+    ####################################################################
+    # Restart or hypermutate restart_fraction of the population, never
+    # touching the best individuals, and evaluate the changed ones so
+    # the next selection sees valid fitness. The hall of fame elites
+    # are copied back in if selection had lost them.
+    ####################################################################
+    def shake(self, population, halloffame):
+        order = sorted(range(len(population)),
+                       key=lambda i: population[i].fitness.values[0])
+        count = int(len(population) * restart_fraction)
+        keep = max(1, len(halloffame) if halloffame is not None else 1)
+        victims = random.sample(order[:len(order) - keep],
+                                k=min(count, len(order) - keep))
+        changed = []
+        for i in victims:
+            if self.action == "restart":
+                ind = self.fresh()
+            else:
+                ind = self.toolbox.clone(population[i])
+                for swap in range(hypermutation_swaps):
+                    ind, = self.toolbox.mutate(ind)
+                del ind.fitness.values
+            population[i] = ind
+            changed.append(ind)
+        fitnesses = self.toolbox.evaluate_population(changed)
+        for ind, fit in zip(changed, fitnesses):
+            ind.fitness.values = fit
+        self.extra_evals += len(changed)
+        if halloffame is not None:
+            present = set(population_hashes(population))
+            for elite, i in zip(halloffame, victims):
+                if hash(repr(elite)) not in present:
+                    population[i] = self.toolbox.clone(elite)
+            halloffame.update(changed)
+
+########################################################################
+# Seconds until the best fitness first reached target, or None
+########################################################################
+def time_to_target(times, best, target):
+    for elapsed, fitness in zip(times, best):
+        if fitness >= target:
+            return elapsed
+    return None
+
+########################################################################
+# Solve schedule_file once per seed without and with diversity
+# restarts, quiet and uncached, and report for each how long it took to
+# reach target. Returns [(seed, plain seconds, monitored seconds)],
+# None where the target was never reached.
+########################################################################
+def compare_runs(schedule_file="SCHEDULE.txt", target=250, seeds=range(3)):
+    saved = teamcamp.quiet, teamcamp.cache_dir, teamcamp.best_schedule_file, \
+        teamcamp.random_seed, teamcamp.diversity_restarts
+    teamcamp.quiet = True
+    teamcamp.cache_dir = None
+    teamcamp.best_schedule_file = None
+    results = []
+    try:
+        for seed in seeds:
+            row = [seed]
+            for restarts in (False, True):
+                teamcamp.random_seed = seed
+                teamcamp.diversity_restarts = restarts
+                times = []
+                start = time.perf_counter()
+
+                def on_generation(gen, population, halloffame, logbook):
+                    times.append(time.perf_counter() - start)
+                    return False
+
+                pop, log, hof = teamcamp.main(schedule_file, on_generation=on_generation)
+                row.append(time_to_target(times, log.select("max"), target))
+            results.append(tuple(row))
+    finally:
+        (teamcamp.quiet, teamcamp.cache_dir, teamcamp.best_schedule_file,
+         teamcamp.random_seed, teamcamp.diversity_restarts) = saved
+    return results
+
+def print_comparison(results, target):
+    print("Time to reach fitness", target, "(s):")
+    plain_total = 0.0
+    monitored_total = 0.0
+    for seed, plain, monitored in results:
+        print("seed", seed, "  plain", plain, "  with restarts", monitored)
+        if plain is not None and monitored is not None:
+            plain_total += plain
+            monitored_total += monitored
+    print("Wall time saved where both reached it: ",
+          round(plain_total - monitored_total, 3), "s")
+
+if __name__ == "__main__":
+    import sys
+    target = int(sys.argv[2]) if len(sys.argv) > 2 else 250
+    print_comparison(compare_runs(sys.argv[1] if len(sys.argv) > 1 else "SCHEDULE.txt",
+                                  target), target)
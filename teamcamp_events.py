@@ -0,0 +1,91 @@
+##########################################################################
+# JSONL event stream for teamcamp.py, enabled with event_file. Tools
+# follow a run from this instead of scraping stdout. One JSON object per
+# line, each with an "event" field:
+#     run        schedule file, seed, GA parameters, team and court counts
+#     generation gen, nevals, stats columns, elapsed and gen_time seconds
+#     best       final best fitness and schedule as a game list,
+#                [[slot, court, team1, team2], ...] (empty courts left out)
+#     done       total wall time and generations run
+# Lines go through one large write buffer and are never flushed per
+# generation, so a slow disk or reader does not stall the GA. The
+# stream is flushed when it is closed at the end of main(). Streaming to
+# stdout ("-") turns on quiet for the run, so stdout stays pure JSONL.
+##########################################################################
+
+import json
+import os
+import sys
+import time
+
+# Bytes held before the buffer is written out
+event_buffer_size = 1 << 20
+
+########################################################################
+# Game list encoding of a grid schedule, same as
+# teamcamp_sparse.grid_to_games but with plain ints for JSON.
+########################################################################
+def compact_schedule(schedule):
+    return [[x, y, int(court[0]), int(court[1])] for x, slot in enumerate(schedule)
+            for y, court in enumerate(slot) if court[0] or court[1]]
+
+def plain_value(value):
+    if isinstance(value, (bool, int, str)) or value is None:
+        return value
+    return float(value)
+
+class EventStream:
+    ####################################################################
+    # target is a filename, "-" for stdout, or an open text file. Files
+    # we open are closed by close(), others are only flushed.
+    ####################################################################
+    def __init__(self, target, buffer_size=None):
+        buffer_size = event_buffer_size if buffer_size is None else buffer_size
+        if target == "-":
+            sys.stdout.flush()
+            self.output = os.fdopen(sys.stdout.fileno(), "w", buffering=buffer_size,
+                                    closefd=False)
+            self.owned = True
+        elif isinstance(target, str):
+            self.output = open(target, "w", buffering=buffer_size)
+            self.owned = True
+        else:
+            self.output = target
+            self.owned = False
+        self.start = time.perf_counter()
+        self.last = self.start
+        self.generations = 0 # Generations run, not counting the initial population
+
+    def emit(self, event, **fields):
+        fields = dict(event=event, **fields)
+        self.output.write(json.dumps(fields, separators=(",", ":")) + "\n")
+
+    ####################################################################
+    # Wrap an on_generation hook (or None) so each generation is also
+    # written as a generation event from the logbook's last record.
+    ####################################################################
+    def generation_hook(self, on_generation=None):
+        def hook(gen, population, halloffame, logbook):
+            now = time.perf_counter()
+            record = {key: plain_value(value) for key, value in logbook[-1].items()}
+            record.update(elapsed=round(now - self.start, 6),
+                          gen_time=round(now - self.last, 6))
+            self.last = now
+            self.generations = gen
+            self.emit("generation", **record)
+            if on_generation is not None:
+                return on_generation(gen, population, halloffame, logbook)
+            return False
+        return hook
+
+    def best(self, schedule, fitness):
+        self.emit("best", fitness=plain_value(fitness),
+                  games=compact_schedule(schedule))
+
+    def close(self):
+        self.emit("done", wall_time=round(time.perf_counter() - self.start, 6),
+                  generations=self.generations)
+        if self.owned:
+            self.output.close()
+        else:
+            self.output.flush()
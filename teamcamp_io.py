@@ -0,0 +1,211 @@
+##########################################################################
+# Light weight input handling for teamcamp.py: SCHEDULE.txt parsing,
+# matchup scores, camp checks and run configs. Only the standard
+# library is used, so validating a camp file never loads numpy or deap.
+# teamcamp.py builds its camp globals on top of parse_schedule().
+##########################################################################
+
+import ast
+import json
+import os
+
+class ScheduleError(ValueError):
+    pass
+
+########################################################################
+# Parse a team file. Returns the master list of teams to schedule
+#     [name, team number, 1 for V / 2 for JV, rank, start, end]
+# the list of conflicting team pairs (V and JV of a school that can't
+# play at the same time) and lvl_and_rank, [level, rank] of every team.
+# Raises ScheduleError naming the first team that could not be read.
+########################################################################
+def parse_schedule(filename="SCHEDULE.txt"):
+    teams_to_schedule = []
+    conflicting_teams = []
+    lvl_and_rank = []
+    with open(filename, "r") as input_file:
+        for line_number, line in enumerate(input_file, 1):
+            if len(line.strip()) == 0:
+                continue
+            fields = line.strip().split("-")
+            try:
+                if fields[1] == '1' or fields[1] == '2':
+                    # Single Team Case
+                    level = int(fields[1])
+                    levels = [(fields[0] + (" V" if level == 1 else " JV"),
+                               level, int(fields[3]))]
+                elif fields[1] == '3':
+                    # Varsity and JV team, [2] will be Y if they can play
+                    # at the same time
+                    ranks = fields[3].strip().split(",")
+                    levels = [(fields[0] + " V", 1, int(ranks[0])),
+                              (fields[0] + " JV", 2, int(ranks[1]))]
+                    if fields[2] == 'N' or fields[2] == 'n':
+                        number = len(teams_to_schedule) + 1
+                        conflicting_teams.append([number, number + 1])
+                else:
+                    raise ValueError(fields[1])
+                start = int(fields[4])
+                end = int(fields[5])
+            except (IndexError, ValueError):
+                raise ScheduleError("Problem with " + os.path.basename(filename)
+                                    + " line " + str(line_number)
+                                    + ", please fix team named: " + fields[0])
+            for name, level, rank in levels:
+                teams_to_schedule.append([name, len(teams_to_schedule) + 1,
+                                          level, rank, start, end])
+                lvl_and_rank.append([level, rank])
+    return teams_to_schedule, conflicting_teams, lvl_and_rank
+
+########################################################################
+# Score of team playing opponent, from team's point of view. +5 if it's
+# an exact level match, +2 if it's only one rank above or below.
+# lvl_and_rank[i-1][0] = v or jv, lvl_and_rank[i-1][1] = rank
+########################################################################
+def matchup_score(lvl_and_rank, team, opponent):
+    team_lvl, team_rank = lvl_and_rank[team-1]
+    opp_lvl, opp_rank = lvl_and_rank[opponent-1]
+    if team_lvl == opp_lvl:
+        # Both V or JV, now check level matchup
+        if team_rank == opp_rank:
+            # Perfect match, maximum reward
+            return 5
+        elif abs(team_rank - opp_rank) <= 1:
+            # Only one rank off, give small reward
+            return 2
+        else:
+            # Bad match, but same level. Minor penalty
+            return -1
+    elif team_lvl == 1:
+        # team is the V team, check if its rank 3 and opponent is rank 1
+        if (team_rank == 3) and (opp_rank == 1):
+            return 1
+        return -5
+    else:
+        # opponent is V team, check if it's rank 3 and team is rank 1
+        if (team_rank == 1) and (opp_rank == 3):
+            return 1
+        return -5
+
+########################################################################
+# Upper bound on the fitness of any schedule: every team plays its 3
+# best possible opponents, each a unique matchup (+5), and nothing is
+# penalized. Penalties only ever lower the score below this.
+########################################################################
+def fitness_bound(lvl_and_rank):
+    bound = 0
+    teams = range(1, len(lvl_and_rank) + 1)
+    for team in teams:
+        scores = sorted((matchup_score(lvl_and_rank, team, opponent) + 5
+                         for opponent in teams if opponent != team),
+                        reverse=True)
+        bound += sum(scores[:3])
+    return bound
+
+########################################################################
+# Day and hour of every time slot, in schedule order
+########################################################################
+def slot_hours(day_hours):
+    return [(day, hour) for day, (start, end) in enumerate(day_hours, 1)
+            for hour in range(start, end)]
+
+########################################################################
+# Time slots a team may play in, as one bool per slot. A team's start
+# time is its arrival on the first day and its end time its departure
+# on the last day, so a game must start no earlier than the start time
+# on the first day and finish by the end time on the last day. 0 means
+# no limit.
+########################################################################
+def team_slots(start, end, day_hours):
+    last_day = len(day_hours)
+    return [not ((day == 1 and start != 0 and hour < start)
+                 or (day == last_day and end != 0 and hour + 1 > end))
+            for day, hour in slot_hours(day_hours)]
+
+########################################################################
+# Check a parsed camp against a court/day layout. Returns a list of
+# problems, empty if the camp can be scheduled as given:
+#   - rank outside 1-3
+#   - start/end times outside the days or leaving under 3 time slots
+#   - more games needed (3 per team) than there are courts x time slots
+########################################################################
+def check_schedule(teams_to_schedule, day_hours, tot_courts):
+    problems = []
+    hours = slot_hours(day_hours)
+    for name, number, level, rank, start, end in teams_to_schedule:
+        if rank not in (1, 2, 3):
+            problems.append(name + ": rank " + str(rank) + " is not 1-3")
+        slots = sum(team_slots(start, end, day_hours))
+        if slots < 3:
+            problems.append(name + ": start " + str(start) + " and end "
+                            + str(end) + " leave " + str(slots)
+                            + " time slots for 3 games")
+    games = (3 * len(teams_to_schedule) + 1) // 2
+    if games > len(hours) * tot_courts:
+        problems.append(str(games) + " games do not fit on " + str(tot_courts)
+                        + " courts over " + str(len(hours)) + " time slots")
+    return problems
+
+########################################################################
+# The user editable variables as set in teamcamp.py, read from its
+# source with ast instead of importing it (which loads numpy and deap).
+# Only assignments of plain literals above "DO NOT EDIT BELOW" count.
+########################################################################
+def user_params(filename=None):
+    if filename is None:
+        filename = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "teamcamp.py")
+    with open(filename, "r") as input_file:
+        source = input_file.read().split("DO NOT EDIT BELOW")[0]
+    tree = ast.parse(source, filename)
+    params = {}
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and len(node.targets) == 1 \
+                and isinstance(node.targets[0], ast.Name):
+            try:
+                params[node.targets[0].id] = ast.literal_eval(node.value)
+            except ValueError:
+                continue
+    return params
+
+########################################################################
+# Court and day layout from a set of parameters, as teamcamp.py derives
+# it: (day_hours, tot_courts)
+########################################################################
+def layout(params):
+    day_hours = ([(params["day1_start"], params["day1_end"]),
+                  (params["day2_start"], params["day2_end"])]
+                 + [tuple(day) for day in params["more_days"]])
+    tot_courts = (params["loc1_courts"] + params["loc2_courts"]
+                  + params["loc3_courts"] + params["loc4_courts"])
+    return day_hours, tot_courts
+
+########################################################################
+# Read a run config, TOML (.toml) or JSON (anything else). Keys are the
+# names of the user editable variables in teamcamp.py; they may also
+# be grouped in tables/objects, eg [ga] or [courts], which are
+# flattened. Unknown names raise ValueError against known, the
+# parameters the config may set with their defaults. TOML has no null,
+# so false turns off a parameter whose default is None or a filename.
+########################################################################
+def load_config(filename, known=None):
+    if filename.endswith(".toml"):
+        import tomllib
+        with open(filename, "rb") as input_file:
+            data = tomllib.load(input_file)
+    else:
+        with open(filename, "r") as input_file:
+            data = json.load(input_file)
+    config = {}
+    for key, value in data.items():
+        if isinstance(value, dict):
+            config.update(value)
+        else:
+            config[key] = value
+    if known is not None:
+        for key, value in config.items():
+            if key not in known:
+                raise ValueError("Unknown config parameter: " + key)
+            if value is False and not isinstance(known[key], bool):
+                config[key] = None
+    return config
@@ -0,0 +1,150 @@
+##########################################################################
+# NumPy GA engine for teamcamp.py. Same loop as eaSimple, but the whole
+# population is one int array
+#     pop[Individual][TimeSegment][Court][TeamSide]
+# and fitness is one float array, so no per individual DEAP objects are
+# built, cloned or compiled into stats during the run:
+#   - selection copies rows by index, no deepcopy of nested lists
+#   - tournament selection is one random draw plus argmax
+#   - mutation swaps two teams in every mutating row at once
+#   - stats are computed straight from the fitness array
+# Crossover still rebuilds children with teamcamp.schedule_cx, one pair
+# at a time. DEAP individuals are only built for the hall of fame and
+# the final population.
+##########################################################################
+
+import time
+import numpy
+
+from deap import creator
+from deap import tools
+
+import teamcamp
+
+########################################################################
+# Tournament selection over the fitness array: k tournaments of
+# tournsize random contestants each, drawn in one go. Returns the row
+# index of every winner.
+########################################################################
+def sel_tournament(rng, fitness, k, tournsize):
+    aspirants = rng.integers(0, len(fitness), size=(k, tournsize))
+    return aspirants[numpy.arange(k), numpy.argmax(fitness[aspirants], axis=1)]
+
+########################################################################
+# Mutation for all rows in rows at once, same as teamcamp.schedule_mut:
+# swap every game of two random teams.
+########################################################################
+def mutate_rows(rng, pop, rows):
+    if len(rows) == 0:
+        return
+    team1 = rng.integers(1, teamcamp.num_of_teams + 1, size=len(rows))
+    team2 = rng.integers(1, teamcamp.num_of_teams, size=len(rows))
+    team2 += team2 >= team1 # Two different teams
+    team1 = team1[:, None, None, None]
+    team2 = team2[:, None, None, None]
+    sub = pop[rows]
+    pop[rows] = numpy.where(sub == team1, team2, numpy.where(sub == team2, team1, sub))
+
+########################################################################
+# Crossover on rows (i, i+1) for every i in rows, using schedule_cx
+########################################################################
+def crossover_rows(pop, rows):
+    for i in rows:
+        sch1 = pop[i].tolist()
+        sch2 = pop[i+1].tolist()
+        teamcamp.schedule_cx(sch1, sch2)
+        pop[i] = sch1
+        pop[i+1] = sch2
+
+########################################################################
+# Update a hall of fame from the fitness array, only building DEAP
+# individuals for the rows that could make it in.
+########################################################################
+def update_hof(halloffame, pop, fitness):
+    best = numpy.argsort(fitness)[::-1][:halloffame.maxsize]
+    candidates = []
+    for i in best:
+        ind = creator.Individual(pop[i].tolist())
+        ind.fitness.values = (float(fitness[i]),)
+        candidates.append(ind)
+    halloffame.update(candidates)
+
+########################################################################
+# Generation loop taking the same parameters as main() passes to
+# eaSimple. population may be a list of schedules (as built by
+# generate_schedule) or an int array. on_generation works as in
+# teamcamp.ea_simple() but is handed the population array, and so does
+# rates. Returns the final population as DEAP individuals and the
+# logbook, with the same columns main()'s stats produce.
+########################################################################
+def ea_numpy(population, cxpb, mutpb, ngen, tournsize, halloffame=None,
+             verbose=True, seed=None, on_generation=None, rates=None):
+    rng = numpy.random.default_rng(seed)
+    pop = numpy.array(population, dtype=numpy.int32)
+    size = len(pop)
+    fitness = numpy.array([fit[0] for fit in teamcamp.evaluate_population(pop)],
+                          dtype=float)
+
+    logbook = tools.Logbook()
+    logbook.header = ["gen", "nevals", "avg", "std", "min", "max"]
+    rate_columns = {}
+    if rates is not None:
+        logbook.header += ["cxpb", "mutpb"]
+        cxpb, mutpb = rates.cxpb, rates.mutpb
+
+    def record(gen, nevals):
+        if halloffame is not None:
+            update_hof(halloffame, pop, fitness)
+        if rates is not None:
+            rate_columns.update(cxpb=cxpb, mutpb=mutpb)
+        logbook.record(gen=gen, nevals=nevals, avg=fitness.mean(),
+                       std=fitness.std(), min=fitness.min(),
+                       max=fitness.max(), **rate_columns)
+        if verbose:
+            print(logbook.stream)
+        if on_generation is not None:
+            return on_generation(gen, pop, halloffame, logbook)
+        return False
+
+    cancelled = record(0, size)
+    for gen in range(1, ngen + 1):
+        if cancelled:
+            break
+        # Select the next generation, a plain copy of the winning rows
+        chosen = sel_tournament(rng, fitness, size, tournsize)
+        pop = pop[chosen]
+        fitness = fitness[chosen]
+
+        # Vary, with the same decisions varAnd makes
+        pairs = numpy.flatnonzero(rng.random(size // 2) < cxpb) * 2
+        mutants = numpy.flatnonzero(rng.random(size) < mutpb)
+        start = time.process_time()
+        crossover_rows(pop, pairs)
+        cx_time = time.process_time() - start
+        start = time.process_time()
+        mutate_rows(rng, pop, mutants)
+        mut_time = time.process_time() - start
+
+        # Evaluate everything that changed as one batch
+        parent = fitness.copy()
+        crossed = numpy.concatenate((pairs, pairs + 1))
+        changed = numpy.union1d(crossed, mutants)
+        start = time.process_time()
+        if len(changed):
+            fits = teamcamp.evaluate_population(pop[changed])
+            fitness[changed] = [fit[0] for fit in fits]
+        eval_time = time.process_time() - start
+        cancelled = record(gen, len(changed))
+        if rates is not None:
+            # Logged with the rates this generation used, now retune them
+            rows = numpy.arange(size)
+            cxpb, mutpb = rates.observe(parent, fitness,
+                    numpy.isin(rows, crossed), numpy.isin(rows, mutants),
+                    cx_time, mut_time, eval_time)
+
+    final_pop = []
+    for i in range(size):
+        ind = creator.Individual(pop[i].tolist())
+        ind.fitness.values = (float(fitness[i]),)
+        final_pop.append(ind)
+    return final_pop, logbook
@@ -0,0 +1,360 @@
+##########################################################################
+# Multiprocess helpers for teamcamp.py. The population is kept in a
+# single shared memory block of team IDs, laid out exactly like the
+# nested list individuals:
+#     pop[Individual][TimeSegment][Court][TeamSide]
+# Worker processes attach to that block once and then evaluate, cross
+# over and mutate ranges of individuals in place. Only fitness values
+# and the indexes they belong to are sent back to the parent, so the
+# schedules themselves are never pickled between processes.
+##########################################################################
+
+import random
+import numpy
+
+from multiprocessing import Pool
+from multiprocessing import shared_memory
+
+from deap import creator
+from deap import tools
+
+import teamcamp
+
+# Team IDs never go above a few hundred, int32 is plenty
+pop_dtype = numpy.int32
+
+# Set inside each worker by init_worker()
+_worker_pop = None
+
+########################################################################
+# A population of schedules stored in shared memory. The parent creates
+# the block, workers attach to it by name. The numpy view in .array is
+# indexed just like a regular population.
+########################################################################
+class SharedPopulation:
+    def __init__(self, shape, name=None):
+        self.shape = tuple(shape)
+        nbytes = int(numpy.prod(self.shape)) * numpy.dtype(pop_dtype).itemsize
+        if name is None:
+            # Parent process, create and own the block
+            self.shm = shared_memory.SharedMemory(create=True, size=nbytes)
+            self.owner = True
+        else:
+            # Worker process, attach to an existing block
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.owner = False
+        self.array = numpy.ndarray(self.shape, dtype=pop_dtype, buffer=self.shm.buf)
+
+    @classmethod
+    def from_population(cls, population):
+        # Copy a list based population (as built by generate_schedule)
+        # into a new shared block
+        source = numpy.asarray(population, dtype=pop_dtype)
+        shared = cls(source.shape)
+        shared.array[:] = source
+        return shared
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def individual(self, index):
+        # Rebuild a regular DEAP individual from one row, used for the
+        # hall of fame and the final population
+        return creator.Individual(self.array[index].tolist())
+
+    def close(self):
+        # Drop our view before closing, numpy holds a buffer export
+        self.array = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+########################################################################
+# Copy over the team data calc_fitness and schedule_cx rely on, since
+# workers started with "spawn" do not inherit main()'s globals.
+# team_data is a teamcamp.camp_data() snapshot.
+########################################################################
+def init_team_data(team_data):
+    teamcamp.set_camp_data(team_data)
+
+########################################################################
+# Pool initializer for the shared memory mode. Attaches the worker to
+# the shared population as well as setting up the team data.
+########################################################################
+def init_worker(shm_name, shape, team_data):
+    global _worker_pop
+    _worker_pop = SharedPopulation(shape, name=shm_name)
+    init_team_data(team_data)
+
+########################################################################
+# Random streams. Every pair of the population gets its own stream,
+# derived from the run seed, the generation and the pair index. The
+# crossover/mutation decisions and the draws made inside schedule_mut
+# therefore do not depend on which worker handles the pair, and a
+# seeded run gives the same result for any number of workers.
+########################################################################
+def pair_seed(seed, gen, pair):
+    return int(numpy.random.SeedSequence([seed, gen, pair]).generate_state(1)[0])
+
+def pair_decisions(cxpb, mutpb, size):
+    # Draw from the module RNG, which the caller seeded with pair_seed().
+    # size is 2 for a pair, 1 for the odd individual out at the end.
+    do_cx = size == 2 and random.random() < cxpb
+    do_mut = [random.random() < mutpb for i in range(size)]
+    return do_cx, do_mut
+
+########################################################################
+# Run crossover and mutation on one pair (or a lone individual) of
+# nested list schedules, in place. The module RNG must already be
+# seeded for this pair. Returns the positions within the pair that
+# changed.
+########################################################################
+def vary_pair(schedules, cxpb, mutpb):
+    do_cx, do_mut = pair_decisions(cxpb, mutpb, len(schedules))
+    changed = []
+    if do_cx:
+        teamcamp.schedule_cx(schedules[0], schedules[1])
+        changed = [0, 1]
+    for k, mutate in enumerate(do_mut):
+        if mutate:
+            teamcamp.schedule_mut(schedules[k])
+            if k not in changed:
+                changed.append(k)
+    return sorted(changed)
+
+########################################################################
+# Worker task: evaluate individuals [start, stop). Returns the start
+# index and a list of fitness values.
+########################################################################
+def evaluate_range(start, stop):
+    fits = teamcamp.evaluate_population(_worker_pop.array[start:stop])
+    return start, [fit[0] for fit in fits]
+
+########################################################################
+# Worker task: apply variation to individuals [start, stop) in place and
+# evaluate whatever changed. start is always even so pairs never cross
+# range boundaries. Returns the indexes that were re-evaluated and their
+# new fitness values.
+########################################################################
+def vary_range(start, stop, cxpb, mutpb, seed, gen):
+    pop = _worker_pop.array
+    indexes = []
+    for i in range(start, stop, 2):
+        random.seed(pair_seed(seed, gen, i // 2))
+        rows = list(range(i, min(i + 2, stop)))
+        schedules = [pop[j].tolist() for j in rows]
+        for k in vary_pair(schedules, cxpb, mutpb):
+            pop[rows[k]] = schedules[k]
+            indexes.append(rows[k])
+    # Evaluate everything that changed as one batch
+    fits = teamcamp.evaluate_population(pop[indexes])
+    return indexes, [fit[0] for fit in fits]
+
+########################################################################
+# Split [0, size) into even aligned ranges, a few per worker so a slow
+# range does not leave the rest of the pool idle.
+########################################################################
+def split_ranges(size, workers, per_worker=4):
+    chunk = max(2, -(-size // (workers * per_worker)))
+    chunk += chunk % 2
+    return [(i, min(i + chunk, size)) for i in range(0, size, chunk)]
+
+########################################################################
+# Tournament selection on the fitness array, same draw as
+# tools.selTournament but returning row indexes instead of individuals.
+########################################################################
+def sel_tournament_index(fitness, k, tournsize):
+    chosen = []
+    size = len(fitness)
+    for i in range(k):
+        aspirants = [random.randrange(size) for j in range(tournsize)]
+        chosen.append(max(aspirants, key=fitness.__getitem__))
+    return chosen
+
+########################################################################
+# Update a hall of fame from the fitness array, only building DEAP
+# individuals for the handful of rows that could make it in.
+########################################################################
+def update_hof(halloffame, shared, fitness):
+    best = numpy.argsort(fitness)[::-1][:halloffame.maxsize]
+    candidates = []
+    for i in best:
+        ind = shared.individual(i)
+        ind.fitness.values = (float(fitness[i]),)
+        candidates.append(ind)
+    halloffame.update(candidates)
+
+########################################################################
+# Generation loop equivalent to algorithms.eaSimple, but the population
+# lives in shared memory and workers do the evaluation and variation.
+# team_data defaults to the globals in teamcamp. Selection draws from
+# the module RNG, so seed it as well as passing seed for reproducible
+# runs. on_generation works as in teamcamp.ea_simple() but is handed
+# the SharedPopulation instead of a list of individuals. Returns the
+# final population as DEAP individuals and the logbook, like eaSimple
+# does.
+########################################################################
+def ea_shared(population, cxpb, mutpb, ngen, tournsize, workers,
+              halloffame=None, verbose=True, team_data=None, seed=None,
+              on_generation=None):
+    if seed is None:
+        seed = random.SystemRandom().randrange(2**32)
+    if team_data is None:
+        team_data = teamcamp.camp_data()
+    shared = SharedPopulation.from_population(population)
+    size = shared.shape[0]
+    fitness = numpy.zeros(size)
+    ranges = split_ranges(size, workers)
+
+    logbook = tools.Logbook()
+    logbook.header = ["gen", "nevals", "avg", "std", "min", "max"]
+
+    def record(gen, nevals):
+        logbook.record(gen=gen, nevals=nevals, avg=fitness.mean(),
+                       std=fitness.std(), min=fitness.min(),
+                       max=fitness.max())
+        if verbose:
+            print(logbook.stream)
+        if on_generation is not None:
+            return on_generation(gen, shared, halloffame, logbook)
+        return False
+
+    try:
+        with Pool(workers, initializer=init_worker,
+                  initargs=(shared.name, shared.shape, team_data)) as pool:
+            # Evaluate the initial population
+            for start, fits in pool.starmap(evaluate_range, ranges):
+                fitness[start:start+len(fits)] = fits
+            if halloffame is not None:
+                update_hof(halloffame, shared, fitness)
+            cancelled = record(0, size)
+
+            for gen in range(1, ngen + 1):
+                if cancelled:
+                    break
+                # Select the next generation, copying rows in place
+                chosen = sel_tournament_index(fitness, size, tournsize)
+                shared.array[:] = shared.array[chosen]
+                fitness = fitness[chosen]
+
+                # Workers draw the variation decisions from per pair
+                # streams, they only need the probabilities and the seed
+                tasks = [(start, stop, cxpb, mutpb, seed, gen)
+                         for start, stop in ranges]
+
+                nevals = 0
+                for indexes, fits in pool.starmap(vary_range, tasks):
+                    fitness[indexes] = fits
+                    nevals += len(indexes)
+
+                if halloffame is not None:
+                    update_hof(halloffame, shared, fitness)
+                cancelled = record(gen, nevals)
+
+        final_pop = []
+        for i in range(size):
+            ind = shared.individual(i)
+            ind.fitness.values = (float(fitness[i]),)
+            final_pop.append(ind)
+    finally:
+        shared.close()
+    return final_pop, logbook
+
+########################################################################
+# Worker task for the regular (non shared) mode: receives one pair of
+# parents as plain lists, varies and evaluates them and sends the
+# finished children back. Children that were left untouched come back
+# as None so the parent keeps its copy and fitness.
+########################################################################
+def vary_and_evaluate(pair, schedules, cxpb, mutpb, seed, gen):
+    random.seed(pair_seed(seed, gen, pair))
+    changed = vary_pair(schedules, cxpb, mutpb)
+    children = [None] * len(schedules)
+    for k in changed:
+        children[k] = (schedules[k], teamcamp.calc_fitness(schedules[k]))
+    return children
+
+def evaluate_schedule(schedule):
+    return teamcamp.calc_fitness(schedule)
+
+########################################################################
+# Parallel replacement for algorithms.varAnd followed by evaluation.
+# Paired offspring are sent to the pool, crossed over, mutated and
+# evaluated there. Pairs the per pair stream leaves untouched are
+# skipped before anything is pickled. Returns the offspring list with
+# valid fitnesses and the number of evaluations done.
+########################################################################
+def var_and_parallel(pool, toolbox, population, cxpb, mutpb, seed, gen):
+    offspring = [toolbox.clone(ind) for ind in population]
+    tasks = []
+    for i in range(0, len(offspring), 2):
+        pair = offspring[i:i+2]
+        # Replay the pair's decisions locally to see if it needs a worker
+        random_state = random.getstate()
+        random.seed(pair_seed(seed, gen, i // 2))
+        do_cx, do_mut = pair_decisions(cxpb, mutpb, len(pair))
+        random.setstate(random_state)
+        if do_cx or any(do_mut):
+            tasks.append((i // 2, [list(ind) for ind in pair], cxpb, mutpb,
+                          seed, gen))
+
+    nevals = 0
+    for task, children in zip(tasks, pool.starmap(vary_and_evaluate, tasks)):
+        for k, child in enumerate(children):
+            if child is None:
+                continue
+            ind = creator.Individual(child[0])
+            ind.fitness.values = child[1]
+            offspring[task[0] * 2 + k] = ind
+            nevals += 1
+    return offspring, nevals
+
+########################################################################
+# Generation loop equivalent to algorithms.eaSimple with evaluation and
+# variation done in a process pool. Uses toolbox.select and
+# toolbox.clone from the caller's toolbox, the operators themselves are
+# always the teamcamp ones. on_generation works as in
+# teamcamp.ea_simple(). Returns the final population and logbook.
+########################################################################
+def ea_parallel(population, toolbox, cxpb, mutpb, ngen, workers, stats=None,
+                halloffame=None, verbose=True, team_data=None, seed=None,
+                on_generation=None):
+    if seed is None:
+        seed = random.SystemRandom().randrange(2**32)
+    if team_data is None:
+        team_data = teamcamp.camp_data()
+
+    logbook = tools.Logbook()
+    logbook.header = ["gen", "nevals"] + (stats.fields if stats else [])
+
+    def record(gen, nevals):
+        if halloffame is not None:
+            halloffame.update(population)
+        compiled = stats.compile(population) if stats else {}
+        logbook.record(gen=gen, nevals=nevals, **compiled)
+        if verbose:
+            print(logbook.stream)
+        if on_generation is not None:
+            return on_generation(gen, population, halloffame, logbook)
+        return False
+
+    with Pool(workers, initializer=init_team_data,
+              initargs=(team_data,)) as pool:
+        # Evaluate the individuals with an invalid fitness
+        invalid_ind = [ind for ind in population if not ind.fitness.valid]
+        fitnesses = pool.map(evaluate_schedule, [list(ind) for ind in invalid_ind])
+        for ind, fit in zip(invalid_ind, fitnesses):
+            ind.fitness.values = fit
+        cancelled = record(0, len(invalid_ind))
+
+        for gen in range(1, ngen + 1):
+            if cancelled:
+                break
+            offspring = toolbox.select(population, len(population))
+            offspring, nevals = var_and_parallel(pool, toolbox, offspring,
+                                                 cxpb, mutpb, seed, gen)
+            population[:] = offspring
+            cancelled = record(gen, nevals)
+
+    return population, logbook
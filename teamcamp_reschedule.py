@@ -0,0 +1,160 @@
+##########################################################################
+# Warm start rescheduling for teamcamp.py. main() saves its best
+# schedule together with the teams it was built for. When a few teams
+# change (new arrival time, dropped out, added), the saved schedule is
+# mapped onto the updated SCHEDULE.txt by team name. Teams that did not
+# change keep their games, the affected teams are left out and placed
+# again, and the GA starts from copies of that schedule instead of a
+# random population.
+##########################################################################
+
+import json
+import random
+
+import teamcamp
+
+# Each seeded individual (apart from the first) gets up to this many
+# swaps between an affected team and a random other team
+warm_start_swaps = 3
+
+########################################################################
+# Save a schedule with the team list and conflicts it was built for.
+# Conflicts are stored by team name since team numbers shift whenever a
+# team is added or removed from SCHEDULE.txt.
+########################################################################
+def save_schedule(filename, schedule, teams_to_schedule, conflict_list, fitness=None):
+    names = {team[1]: team[0] for team in teams_to_schedule}
+    data = {"teams": teams_to_schedule,
+            "conflicts": [[names[a], names[b]] for a, b in conflict_list],
+            "fitness": fitness,
+            "schedule": [[[int(team) for team in court] for court in slot]
+                         for slot in schedule]}
+    with open(filename, "w") as output_file:
+        json.dump(data, output_file)
+
+def load_schedule(filename):
+    with open(filename, "r") as input_file:
+        return json.load(input_file)
+
+########################################################################
+# Map conflict pairs to {name: partner name}
+########################################################################
+def conflict_partners(conflict_pairs):
+    partners = {}
+    for a, b in conflict_pairs:
+        partners[a] = b
+        partners[b] = a
+    return partners
+
+########################################################################
+# Map a previously saved schedule onto the current team numbers. A team
+# is affected if it is new, if its level, rank or start/end times
+# changed, if its conflict partner changed, or if one of its games no
+# longer fits on the current courts/time slots. Teams that played a
+# removed or affected team are affected as well, since nothing else
+# would give them back that game. Returns an empty schedule of the
+# current size holding every unaffected game, and the list of affected
+# team numbers that still need to be placed. Games of the affected
+# teams' other opponents are left half filled, place_team completes
+# them before opening new courts (see teamcamp.pick_court).
+########################################################################
+def remap_schedule(previous, teams_to_schedule, conflict_list):
+    old_teams = {team[0]: team for team in previous["teams"]}
+    old_partner = conflict_partners(previous["conflicts"])
+    names = {team[1]: team[0] for team in teams_to_schedule}
+    new_partner = conflict_partners([[names[a], names[b]] for a, b in conflict_list])
+
+    id_map = {}   # old team number -> new team number
+    affected = []
+    for team in teams_to_schedule:
+        old = old_teams.get(team[0])
+        if (old is None or old[2:] != team[2:]
+                or old_partner.get(team[0]) != new_partner.get(team[0])):
+            affected.append(team[1])
+        else:
+            id_map[old[1]] = team[1]
+
+    # Games outside of the current grid cannot be kept
+    old_schedule = previous["schedule"]
+    for x, slot in enumerate(old_schedule):
+        for y, court in enumerate(slot):
+            if x < teamcamp.tot_slots and y < teamcamp.tot_courts:
+                continue
+            for old_id in court:
+                if old_id in id_map:
+                    affected.append(id_map.pop(old_id))
+
+    # Opponents of every team that is not kept, one level deep
+    opponents = set()
+    for slot in old_schedule:
+        for court in slot:
+            if 0 in court:
+                continue
+            kept = [old_id in id_map for old_id in court]
+            if kept[0] != kept[1]:
+                opponents.update(old_id for old_id in court if old_id in id_map)
+    for old_id in opponents:
+        affected.append(id_map.pop(old_id))
+
+    # Conflicting teams are always placed together
+    by_number = {team[1]: team[0] for team in teams_to_schedule}
+    numbers = {team[0]: team[1] for team in teams_to_schedule}
+    for team in list(affected):
+        partner = new_partner.get(by_number[team])
+        if partner is not None and numbers[partner] not in affected:
+            affected.append(numbers[partner])
+            id_map = {k: v for k, v in id_map.items() if v != numbers[partner]}
+
+    schedule = [teamcamp.single_slot() for i in range(teamcamp.tot_slots)]
+    for x, slot in enumerate(old_schedule[:teamcamp.tot_slots]):
+        for y, court in enumerate(slot[:teamcamp.tot_courts]):
+            kept = [id_map.get(old_id, 0) for old_id in court]
+            # Keep a lone team on side 0, place_team completes it there
+            if kept[0] == 0:
+                kept.reverse()
+            schedule[x][y] = kept
+    return schedule, affected
+
+########################################################################
+# Swap two teams' games everywhere in a schedule, like schedule_mut but
+# with the teams picked by the caller.
+########################################################################
+def swap_teams(schedule, team1, team2):
+    for slot in schedule:
+        for court in slot:
+            for k, team in enumerate(court):
+                if team == team1:
+                    court[k] = team2
+                elif team == team2:
+                    court[k] = team1
+    return schedule
+
+########################################################################
+# Replace the initial population with copies of the previous schedule.
+# previous can also be a list of saved schedules (cached elites), which
+# the copies then cycle through. Each copy places the affected teams in
+# a different random order, and all but the first copy of each schedule
+# get a few swaps involving affected teams so the population is not made
+# of clones. Used by main() in place of generate_schedule. Returns the
+# affected team numbers.
+########################################################################
+def warm_start_population(population, previous, teams_to_schedule, conflict_list):
+    # Create global reference to conflict_list for CX access
+    teamcamp.glo_conf_list = conflict_list
+    if isinstance(previous, dict):
+        previous = [previous]
+    seeds = [remap_schedule(p, teams_to_schedule, conflict_list) for p in previous]
+    all_teams = [team[1] for team in teams_to_schedule]
+    affected_teams = set()
+    for h, individual in enumerate(population):
+        base, affected = seeds[h % len(seeds)]
+        affected_teams.update(affected)
+        schedule = [[court[:] for court in slot] for slot in base]
+        order = random.sample(affected, k=len(affected))
+        teamcamp.schedule_teams(schedule, order, conflict_list)
+        if h >= len(seeds):
+            movers = affected if affected else all_teams
+            for i in range(random.randint(1, warm_start_swaps)):
+                swap_teams(schedule, random.choice(movers), random.choice(all_teams))
+        individual[:] = schedule
+    return sorted(affected_teams)
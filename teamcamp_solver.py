@@ -0,0 +1,288 @@
+##########################################################################
+# Anytime solver API for teamcamp.py. A CampSolver runs main() in a
+# background process (or thread) and reports back after every
+# generation, so the current best schedule and stats can be shown while
+# the GA is still running. Solves are cancelled cooperatively: the flag
+# is checked between generations and the run stops with the best
+# schedule found so far.
+#
+# serve_status() exposes any number of running solvers over a small
+# local HTTP endpoint built on asyncio:
+#     GET  /              status of every solver
+#     GET  /<name>        status of one solver, including its best schedule
+#     POST /<name>/cancel cancel that solver
+##########################################################################
+
+import asyncio
+import json
+import multiprocessing
+import queue
+import random
+import sys
+import threading
+import time
+
+from functools import partial
+
+import teamcamp
+
+# How often the listener checks a solve that went quiet is still alive
+poll_interval = 0.5
+
+# Module variables in teamcamp that a solve may override
+solver_params = ("num_of_gens", "pop_size", "tour_size", "mutpb", "cxpb",
+                 "num_of_workers", "shared_population", "random_seed",
+                 "best_schedule_file", "cache_dir", "quiet")
+
+# Held by the one threaded solve allowed to run at a time, since
+# threads share teamcamp's module globals and the random module
+thread_solve_lock = threading.Lock()
+
+########################################################################
+# Body of the background thread or process. Applies the parameter
+# overrides, runs main() and pushes ("generation", data) messages onto
+# progress, then one ("done", data) or ("error", text) message. The best
+# schedule is only sent when it improves, to keep messages small. The
+# overridden variables and the random state are put back afterwards,
+# which matters when running in the caller's process as a thread.
+########################################################################
+def run_solve(schedule_file, params, progress, cancel_event):
+    saved = {name: getattr(teamcamp, name) for name in params}
+    random_state = random.getstate()
+    try:
+        for name, value in params.items():
+            setattr(teamcamp, name, value)
+        solve(schedule_file, progress, cancel_event)
+    finally:
+        for name, value in saved.items():
+            setattr(teamcamp, name, value)
+        random.setstate(random_state)
+
+def run_thread_solve(schedule_file, params, progress, cancel_event):
+    try:
+        run_solve(schedule_file, params, progress, cancel_event)
+    finally:
+        thread_solve_lock.release()
+
+def solve(schedule_file, progress, cancel_event):
+    last_best = [None]
+
+    def on_generation(gen, population, halloffame, logbook):
+        message = {"gen": gen, "stats": plain_record(logbook[-1])}
+        best = halloffame[0]
+        fitness = best.fitness.values[0]
+        if last_best[0] is None or fitness > last_best[0]:
+            last_best[0] = fitness
+            message["best"] = plain_schedule(best)
+            message["fitness"] = fitness
+        progress.put(("generation", message))
+        return cancel_event.is_set()
+
+    try:
+        pop, log, hof = teamcamp.main(schedule_file, on_generation=on_generation)
+        progress.put(("done", {"best": plain_schedule(hof[0]),
+                               "fitness": hof[0].fitness.values[0],
+                               "log": [plain_record(r) for r in log]}))
+    except BaseException as err:
+        progress.put(("error", repr(err)))
+
+########################################################################
+# Helpers to turn DEAP/numpy values into plain python for pickling and
+# JSON.
+########################################################################
+def plain_schedule(schedule):
+    return [[[int(team) for team in court] for court in slot] for slot in schedule]
+
+def plain_record(record):
+    return {key: (value if isinstance(value, (int, str)) else float(value))
+            for key, value in record.items()}
+
+########################################################################
+# Handle on one background solve. Parameters not given fall back to the
+# values in teamcamp.py. callback, if set, is called as callback(solver)
+# from a listener thread after every progress message.
+#
+# mode="process" runs each solve in its own process, so several solves
+# never share teamcamp's module globals. mode="thread" avoids the
+# process start up but only one threaded solve may run at a time,
+# start() raises RuntimeError while another one is running.
+########################################################################
+class CampSolver:
+    def __init__(self, schedule_file="SCHEDULE.txt", callback=None,
+                 mode="process", **params):
+        for name in params:
+            if name not in solver_params:
+                raise ValueError("Unknown solver parameter: " + name)
+        self.schedule_file = schedule_file
+        self.params = params
+        self.callback = callback
+        self.mode = mode
+        self.state = "pending"
+        self.generation = None
+        self.stats = None
+        self.best_schedule = None
+        self.best_fitness = None
+        self.log = []
+        self.error = None
+        self.started = None
+        self.finished = None
+        self._lock = threading.Lock()
+        self._worker = None
+        self._listener = None
+
+    def start(self):
+        if self.mode == "process":
+            self._progress = multiprocessing.Queue()
+            self._cancel = multiprocessing.Event()
+            self._worker = multiprocessing.Process(target=run_solve,
+                    args=(self.schedule_file, self.params, self._progress,
+                          self._cancel))
+        elif self.mode == "thread":
+            if not thread_solve_lock.acquire(blocking=False):
+                raise RuntimeError("Another threaded solve is already running")
+            self._progress = queue.Queue()
+            self._cancel = threading.Event()
+            self._worker = threading.Thread(target=run_thread_solve, daemon=True,
+                    args=(self.schedule_file, self.params, self._progress,
+                          self._cancel))
+        else:
+            raise ValueError("mode must be 'process' or 'thread'")
+        self.started = time.time()
+        self.state = "running"
+        self._worker.start()
+        self._listener = threading.Thread(target=self._listen, daemon=True)
+        self._listener.start()
+        return self
+
+    def _listen(self):
+        # Drain progress messages until the solve reports it is done
+        while True:
+            try:
+                kind, data = self._progress.get(timeout=poll_interval)
+            except queue.Empty:
+                if self._worker.is_alive():
+                    continue
+                kind, data = "error", "Solver exited without a result"
+            with self._lock:
+                if kind == "generation":
+                    self.generation = data["gen"]
+                    self.stats = data["stats"]
+                    self.log.append(data["stats"])
+                    if "best" in data:
+                        self.best_schedule = data["best"]
+                        self.best_fitness = data["fitness"]
+                elif kind == "done":
+                    self.best_schedule = data["best"]
+                    self.best_fitness = data["fitness"]
+                    self.log = data["log"]
+                    self.state = "cancelled" if self._cancel.is_set() else "done"
+                else:
+                    self.error = data
+                    self.state = "error"
+                if kind != "generation":
+                    self.finished = time.time()
+            if self.callback is not None:
+                self.callback(self)
+            if kind != "generation":
+                break
+        self._worker.join()
+
+    # Ask the solve to stop after the generation it is working on
+    def cancel(self):
+        if self._worker is not None:
+            self._cancel.set()
+
+    def running(self):
+        return self.state == "running"
+
+    # Block until the solve finishes. Returns False on timeout.
+    def wait(self, timeout=None):
+        if self._listener is None:
+            return False
+        self._listener.join(timeout)
+        return not self._listener.is_alive()
+
+    async def wait_async(self, interval=poll_interval):
+        while self.running():
+            await asyncio.sleep(interval)
+        return self.state
+
+    def best(self):
+        with self._lock:
+            return self.best_schedule, self.best_fitness
+
+    # Snapshot of the solve for polling. The schedule itself is only
+    # included when asked for since it is the bulk of the data.
+    def status(self, include_best=False):
+        with self._lock:
+            end = self.finished if self.finished is not None else time.time()
+            status = {"file": self.schedule_file,
+                      "state": self.state,
+                      "generation": self.generation,
+                      "stats": self.stats,
+                      "best_fitness": self.best_fitness,
+                      "elapsed": None if self.started is None else end - self.started,
+                      "error": self.error}
+            if include_best:
+                status["best"] = self.best_schedule
+            return status
+
+########################################################################
+# One HTTP request against the status endpoint. solvers maps a name to
+# a CampSolver. Only ever reads solver snapshots, so a busy solve never
+# holds up requests about the others.
+########################################################################
+async def handle_status_request(solvers, reader, writer):
+    try:
+        request_line = (await reader.readline()).decode("latin-1").split()
+        # Skip the headers, nothing in them matters here
+        while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+            pass
+        code, body = 404, {"error": "not found"}
+        if len(request_line) >= 2:
+            method = request_line[0]
+            parts = [p for p in request_line[1].split("/") if p]
+            if method == "GET" and not parts:
+                code, body = 200, {name: s.status() for name, s in solvers.items()}
+            elif parts and parts[0] in solvers:
+                solver = solvers[parts[0]]
+                if method == "GET" and len(parts) == 1:
+                    code, body = 200, solver.status(include_best=True)
+                elif method == "POST" and parts[1:] == ["cancel"]:
+                    solver.cancel()
+                    code, body = 200, solver.status()
+        payload = json.dumps(body).encode()
+        reason = "OK" if code == 200 else "Not Found"
+        writer.write(("HTTP/1.0 %d %s\r\nContent-Type: application/json\r\n"
+                      "Content-Length: %d\r\n\r\n" % (code, reason, len(payload))
+                      ).encode() + payload)
+        await writer.drain()
+    finally:
+        writer.close()
+
+async def serve_status(solvers, host="127.0.0.1", port=8765):
+    server = await asyncio.start_server(partial(handle_status_request, solvers),
+                                        host, port)
+    async with server:
+        await server.serve_forever()
+
+########################################################################
+# Solve every schedule file given on the command line at once and watch
+# them on http://127.0.0.1:8765/ until they are all finished. Solves
+# run quiet and each saves its best schedule to BEST_SCHEDULE_<n>.json.
+########################################################################
+async def solve_and_serve(schedule_files, host="127.0.0.1", port=8765):
+    solvers = {}
+    for i, schedule_file in enumerate(schedule_files):
+        name = str(i + 1)
+        solvers[name] = CampSolver(schedule_file, quiet=True,
+                best_schedule_file="BEST_SCHEDULE_" + name + ".json").start()
+    server = asyncio.ensure_future(serve_status(solvers, host, port))
+    for name, solver in solvers.items():
+        state = await solver.wait_async()
+        print(name, solver.schedule_file, state, solver.best_fitness)
+    server.cancel()
+    return solvers
+
+if __name__ == "__main__":
+    asyncio.run(solve_and_serve(sys.argv[1:] or ["SCHEDULE.txt"]))
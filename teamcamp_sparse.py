@@ -0,0 +1,247 @@
+##########################################################################
+# Sparse schedules for large camps. Instead of the dense
+#     schedule[TimeSegment][Court][TeamSide]
+# grid, an individual is just the list of games that are scheduled:
+#     games[i] = [slot, court, team1, team2]
+# kept in schedule order (by slot, then court). A half filled game has
+# 0 for team2. Big facilities with few games per hour are mostly empty
+# grid cells, so fitness, crossover and mutation here cost time in the
+# number of games rather than courts x hours. Time slots follow
+# teamcamp.day_hours, so any number of days works.
+#
+# Schedules are converted back to the grid view for output, saving and
+# caching, see games_to_grid().
+##########################################################################
+
+import random
+import numpy
+
+from deap import base
+from deap import creator
+from deap import tools
+
+import teamcamp
+
+########################################################################
+# Conversion between the grid and game list views
+########################################################################
+def grid_to_games(schedule):
+    return [[x, y, court[0], court[1]] for x, slot in enumerate(schedule)
+            for y, court in enumerate(slot) if court[0] or court[1]]
+
+def games_to_grid(games):
+    schedule = [teamcamp.single_slot() for i in range(teamcamp.tot_slots)]
+    for x, y, team1, team2 in games:
+        schedule[x][y] = [team1, team2]
+    return schedule
+
+########################################################################
+# Games of a schedule grouped by time slot, for placement. by_slot[x]
+# holds the games of slot x ordered by court. Games are shared with the
+# flat list so completing a half game updates both.
+########################################################################
+class SlotBook:
+    def __init__(self, games=()):
+        self.games = []
+        self.by_slot = [[] for i in range(teamcamp.tot_slots)]
+        for game in games:
+            self.games.append(game)
+            self.by_slot[game[0]].append(game)
+        for slot_games in self.by_slot:
+            slot_games.sort(key=lambda game: game[1])
+
+    def add(self, x, position, court, team):
+        game = [x, court, team, 0]
+        self.by_slot[x].insert(position, game)
+        self.games.append(game)
+
+    # Back to a sorted game list, written into games in place
+    def write(self, games):
+        games[:] = [game for slot_games in self.by_slot for game in slot_games]
+        return games
+
+    ####################################################################
+    # Try to give team one game in slot x. Mirrors teamcamp.pick_court:
+    # a half filled game is completed unless its team was already faced
+    # (played is the opponent bitset), otherwise the first empty court
+    # starts a new game. Returns the opponent (0 for a new game) or None
+    # if nothing fit.
+    ####################################################################
+    def place(self, x, team, played):
+        court = 0
+        gap = None
+        for position, game in enumerate(self.by_slot[x]):
+            if gap is None and game[1] > court:
+                # First empty court, used if no half game fits
+                gap = (position, court)
+            court = game[1] + 1
+            if game[3] == 0 and not (played >> game[2]) & 1:
+                game[3] = team
+                return game[2]
+        if gap is None and court < teamcamp.tot_courts:
+            gap = (len(self.by_slot[x]), court)
+        if gap is None:
+            return None
+        self.add(x, gap[0], gap[1], team)
+        return 0
+
+########################################################################
+# Same as teamcamp.place_team, on a SlotBook. Slots outside the team's
+# window are skipped with one bit test.
+########################################################################
+def place_team(book, team, conflicting=0):
+    placing = [team, conflicting] if conflicting != 0 else [team]
+    remaining = [3] * len(placing)
+    played = [0] * len(placing)
+    turn = 0
+    for x in range(teamcamp.tot_slots):
+        if remaining[-1] == 0:
+            break
+        current = placing[turn]
+        if not (teamcamp.team_slot_mask[current] >> x) & 1:
+            continue
+        opponent = book.place(x, current, played[turn])
+        if opponent is None:
+            continue
+        if opponent != 0:
+            played[turn] |= 1 << opponent
+        remaining[turn] -= 1
+        turn = (turn + 1) % len(placing)
+    return book
+
+def schedule_teams(book, team_order, conflict_list):
+    partners = {}
+    for a, b in conflict_list:
+        partners[a] = b
+        partners[b] = a
+    already_scheduled = set()
+    for team in team_order:
+        if team in already_scheduled:
+            continue
+        conflicting = partners.get(team, 0)
+        if conflicting != 0:
+            already_scheduled.add(team)
+            already_scheduled.add(conflicting)
+        place_team(book, team, conflicting)
+    return book
+
+########################################################################
+# Random initial population of game lists, like generate_schedule.
+########################################################################
+def generate_population(size, conflict_list):
+    teamcamp.glo_conf_list = conflict_list
+    population = []
+    for h in range(size):
+        team_order_list = random.sample(range(1, teamcamp.num_of_teams+1), k=teamcamp.num_of_teams)
+        book = schedule_teams(SlotBook(), team_order_list, conflict_list)
+        population.append(book.write(creator.SparseIndividual()))
+    return population
+
+########################################################################
+# Crossover, same idea as teamcamp.schedule_cx: merge the parents' team
+# orders and rebuild both children from scratch.
+########################################################################
+def team_order(games):
+    order = []
+    seen = set()
+    for game in games:
+        for team in game[2:]:
+            if team != 0 and team not in seen:
+                seen.add(team)
+                order.append(team)
+    return order
+
+def sparse_cx(games1, games2):
+    order1 = team_order(games1)
+    order2 = team_order(games2)
+    child1_order = teamcamp.merge_team_orders(order1, order2)
+    child2_order = teamcamp.merge_team_orders(order2, order1)
+    schedule_teams(SlotBook(), child1_order, teamcamp.glo_conf_list).write(games1)
+    schedule_teams(SlotBook(), child2_order, teamcamp.glo_conf_list).write(games2)
+    return games1, games2
+
+########################################################################
+# Mutation, same as teamcamp.schedule_mut: swap two random teams.
+########################################################################
+def sparse_mut(games):
+    team1, team2 = random.sample(range(1, teamcamp.num_of_teams+1), k=2)
+    for game in games:
+        for k in (2, 3):
+            if game[k] == team1:
+                game[k] = team2
+            elif game[k] == team2:
+                game[k] = team1
+    return games,
+
+########################################################################
+# Per team game table (see teamcamp.team_game_table) straight from the
+# game lists, without building any grid.
+########################################################################
+def games_table(population):
+    rows = [(i, game[0], game[1], team) for i, games in enumerate(population)
+            for game in games for team in game[2:] if team != 0]
+    if not rows:
+        empty = numpy.zeros(0, dtype=int)
+        return empty, empty, empty, empty
+    ind, slot, court, team = numpy.array(rows).T
+    return teamcamp.sort_game_table(ind, team, slot, court)
+
+########################################################################
+# Fitness, equal to teamcamp.calc_fitness on the grid view of the same
+# schedule. The table penalties run once for the whole batch.
+########################################################################
+def evaluate_population(population):
+    if len(population) == 0:
+        return []
+    penalties = teamcamp.table_penalties(games_table(population), len(population))
+    fitnesses = []
+    for games, penalty in zip(population, penalties):
+        total_fit = teamcamp.score_games([(game[0], game[2], game[3]) for game in games])
+        # Window violations, one bit test per team per game
+        violations = 0
+        for x, y, team1, team2 in games:
+            for team in (team1, team2):
+                if not (teamcamp.team_slot_mask[team] >> x) & 1:
+                    violations += 1
+        total_fit += int(penalty) - teamcamp.window_penalty * violations
+        fitnesses.append((total_fit,))
+    return fitnesses
+
+def sparse_fitness(games):
+    return evaluate_population([games])[0]
+
+########################################################################
+# Toolbox for ea_simple with sparse individuals
+########################################################################
+def build_sparse_toolbox():
+    teamcamp.build_toolbox()
+    if not hasattr(creator, "SparseIndividual"):
+        creator.create("SparseIndividual", list, fitness=creator.FitnessMax)
+    toolbox = base.Toolbox()
+    toolbox.register("evaluate", sparse_fitness)
+    toolbox.register("evaluate_population", evaluate_population)
+    toolbox.register("mate", sparse_cx)
+    toolbox.register("mutate", sparse_mut)
+    toolbox.register("select", tools.selTournament, tournsize=teamcamp.tour_size)
+    return toolbox
+
+########################################################################
+# Switch a population between the two views, keeping fitness values
+########################################################################
+def to_sparse(population):
+    sparse = []
+    for ind in population:
+        games = creator.SparseIndividual(grid_to_games(ind))
+        if ind.fitness.valid:
+            games.fitness.values = ind.fitness.values
+        sparse.append(games)
+    return sparse
+
+def to_grid(population):
+    grid = []
+    for games in population:
+        ind = creator.Individual(games_to_grid(games))
+        if games.fitness.valid:
+            ind.fitness.values = games.fitness.values
+        grid.append(ind)
+    return grid
@@ -0,0 +1,256 @@
+##########################################################################
+# Hyperparameter sweep for teamcamp.py. Runs main() for every point of a
+# search space over the GA parameters, several seeds per point, across a
+# process pool. Each finished run is stored as one row in a local SQLite
+# database:
+#     final fitness, wall time, time to reach target fitness (NULL if
+#     never reached) and fitness evaluations per second
+# Runs already in the database (same camp, court/day layout, fitness
+# weights, engine flags, parameters, seed and target) are skipped, so a
+# sweep can be stopped and resumed or widened later. summarize()
+# averages the seeds of each point and marks the quality versus time
+# Pareto front: points no other point beats on both mean fitness and
+# mean wall time.
+##########################################################################
+
+import csv
+import itertools
+import multiprocessing
+import random
+import sqlite3
+import sys
+import time
+
+import teamcamp
+import teamcamp_cache
+import teamcamp_io
+
+# Parameters a sweep may vary, integers are drawn as integers
+sweep_params = ("pop_size", "num_of_gens", "tour_size", "cxpb", "mutpb")
+int_params = ("pop_size", "num_of_gens", "tour_size")
+# Engine choices every run of a sweep shares with the calling process
+engine_flags = ("sparse_schedules", "numpy_engine", "adaptive_rates",
+                "diversity_restarts")
+
+# Default sweep, used when run from the command line
+sweep_grid = {"pop_size": [100, 250, 500],
+              "num_of_gens": [25, 50],
+              "tour_size": [2, 3],
+              "cxpb": [0.2, 0.5],
+              "mutpb": [0.15]}
+sweep_seeds = 3
+sweep_target = 250 # Fitness counted as good enough for time to target
+sweep_workers = multiprocessing.cpu_count()
+sweep_database = "teamcamp_sweep.db"
+
+########################################################################
+# Search space helpers. A grid is {param: [values]}, every combination
+# is a point. A random space is {param: (low, high)}, each of count
+# points draws every parameter uniformly. Parameters left out keep their
+# value from teamcamp.py.
+########################################################################
+def grid_points(space):
+    names = list(space)
+    return [dict(zip(names, values))
+            for values in itertools.product(*(space[name] for name in names))]
+
+def random_points(space, count, seed=None):
+    rng = random.Random(seed)
+    points = []
+    for i in range(count):
+        point = {}
+        for name, (low, high) in space.items():
+            if name in int_params:
+                point[name] = rng.randint(low, high)
+            else:
+                point[name] = round(rng.uniform(low, high), 3)
+        points.append(point)
+    return points
+
+def full_point(point):
+    for name in point:
+        if name not in sweep_params:
+            raise ValueError("Unknown sweep parameter: " + name)
+    return {name: point.get(name, getattr(teamcamp, name)) for name in sweep_params}
+
+########################################################################
+# The teamcamp settings a sweep holds fixed, as sent to every run: the
+# fitness weights, court/day layout and engine flags.
+########################################################################
+def fixed_settings():
+    return {name: getattr(teamcamp, name)
+            for name in teamcamp.fitness_globals + engine_flags}
+
+########################################################################
+# Key of the camp and fixed settings, from the same run parameters the
+# result cache hashes, less the swept ones, the seed and the pool
+# settings every run overrides. Runs are only reused under the same key.
+########################################################################
+def settings_digest(schedule_file):
+    teams, conflicts, lvl_and_rank = teamcamp_io.parse_schedule(schedule_file)
+    teamcamp.set_layout()
+    params = teamcamp_cache.run_params(teams, conflicts)
+    for name in sweep_params + ("random_seed", "num_of_workers", "shared_population"):
+        del params[name]
+    return teamcamp_cache.digest(params)
+
+########################################################################
+# Result store
+########################################################################
+def open_store(database=None):
+    connection = sqlite3.connect(database or sweep_database)
+    connection.execute("""CREATE TABLE IF NOT EXISTS runs (
+        settings TEXT, pop_size INTEGER, num_of_gens INTEGER, tour_size INTEGER,
+        cxpb REAL, mutpb REAL, seed INTEGER, target REAL,
+        schedule_file TEXT, final_fitness REAL, wall_time REAL,
+        time_to_target REAL, evals INTEGER, evals_per_sec REAL,
+        PRIMARY KEY (settings, pop_size, num_of_gens, tour_size, cxpb, mutpb,
+                     seed, target))""")
+    return connection
+
+def recorded(connection, settings, point, seed, target):
+    row = connection.execute("""SELECT 1 FROM runs WHERE settings=? AND pop_size=?
+        AND num_of_gens=? AND tour_size=? AND cxpb=? AND mutpb=? AND seed=?
+        AND target=?""", (settings, *[point[name] for name in sweep_params],
+                          seed, target)).fetchone()
+    return row is not None
+
+def record_run(connection, result):
+    connection.execute("INSERT OR REPLACE INTO runs VALUES "
+                       "(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                       (result["settings"], *[result[name] for name in sweep_params],
+                        result["seed"], result["target"], result["schedule_file"],
+                        result["final_fitness"], result["wall_time"],
+                        result["time_to_target"], result["evals"],
+                        result["evals_per_sec"]))
+    connection.commit()
+
+def write_csv(connection, filename):
+    cursor = connection.execute("SELECT * FROM runs")
+    with open(filename, "w", newline="") as output_file:
+        writer = csv.writer(output_file)
+        writer.writerow([column[0] for column in cursor.description])
+        writer.writerows(cursor)
+
+########################################################################
+# One solve, run in a pool worker. The fixed settings are applied first,
+# so workers started with spawn match the calling process. main() runs
+# quiet, the cache and best schedule file are turned off so every run
+# starts cold, and the worker never starts a pool of its own.
+########################################################################
+def run_point(task):
+    schedule_file, settings, fixed, point, seed, target = task
+    for name, value in list(fixed.items()) + list(point.items()):
+        setattr(teamcamp, name, value)
+    teamcamp.set_layout()
+    teamcamp.random_seed = seed
+    teamcamp.num_of_workers = 1
+    teamcamp.shared_population = False
+    teamcamp.cache_dir = None
+    teamcamp.best_schedule_file = None
+    teamcamp.previous_schedule_file = None
+    teamcamp.event_file = None
+    teamcamp.quiet = True
+    reached = [None]
+    start = time.perf_counter()
+
+    def on_generation(gen, population, halloffame, logbook):
+        if reached[0] is None and logbook[-1]["max"] >= target:
+            reached[0] = time.perf_counter() - start
+        return False
+
+    pop, log, hof = teamcamp.main(schedule_file, on_generation=on_generation)
+    wall_time = time.perf_counter() - start
+    evals = int(sum(log.select("nevals")))
+    result = dict(point, settings=settings, seed=seed, target=target,
+                  schedule_file=schedule_file,
+                  final_fitness=float(hof[0].fitness.values[0]),
+                  wall_time=wall_time, time_to_target=reached[0], evals=evals,
+                  evals_per_sec=evals / wall_time)
+    return result
+
+########################################################################
+# Run every point with seeds 0..seeds-1 that is not yet in the store.
+# Results are stored as they arrive, so an interrupted sweep keeps what
+# finished. Returns the number of runs made.
+########################################################################
+def run_sweep(points, schedule_file="SCHEDULE.txt", seeds=None, target=None,
+              workers=None, database=None, verbose=True):
+    seeds = sweep_seeds if seeds is None else seeds
+    target = sweep_target if target is None else target
+    workers = sweep_workers if workers is None else workers
+    settings = settings_digest(schedule_file)
+    fixed = fixed_settings()
+    connection = open_store(database)
+    tasks = []
+    for point in points:
+        point = full_point(point)
+        for seed in range(seeds):
+            if not recorded(connection, settings, point, seed, target):
+                tasks.append((schedule_file, settings, fixed, point, seed, target))
+    if verbose:
+        print("Sweep runs to make: ", len(tasks))
+    with multiprocessing.Pool(workers) as pool:
+        for i, result in enumerate(pool.imap_unordered(run_point, tasks)):
+            record_run(connection, result)
+            if verbose:
+                print(i + 1, "/", len(tasks),
+                      {name: result[name] for name in sweep_params},
+                      "seed", result["seed"], "fitness", result["final_fitness"],
+                      "time", round(result["wall_time"], 2))
+    connection.close()
+    return len(tasks)
+
+########################################################################
+# Mean results per point for one camp under the current fixed settings,
+# best fitness first. Each row has the point, run count, mean fitness,
+# mean wall time, mean time to target (over the runs that reached it),
+# share of runs that reached the target, mean evals per second and
+# whether it is on the Pareto front of fitness (higher is better)
+# against wall time (lower).
+########################################################################
+def summarize(schedule_file="SCHEDULE.txt", target=None, database=None):
+    target = sweep_target if target is None else target
+    connection = open_store(database)
+    columns = ", ".join(sweep_params)
+    rows = connection.execute("""SELECT """ + columns + """, COUNT(*),
+        AVG(final_fitness), AVG(wall_time), AVG(time_to_target),
+        AVG(time_to_target IS NOT NULL), AVG(evals_per_sec)
+        FROM runs WHERE settings=? AND target=? GROUP BY """ + columns,
+        (settings_digest(schedule_file), target)).fetchall()
+    connection.close()
+    summary = []
+    for row in rows:
+        entry = dict(zip(sweep_params, row))
+        (entry["runs"], entry["fitness"], entry["wall_time"],
+         entry["time_to_target"], entry["reached"],
+         entry["evals_per_sec"]) = row[len(sweep_params):]
+        summary.append(entry)
+    for entry in summary:
+        entry["pareto"] = not any(
+            other["fitness"] >= entry["fitness"]
+            and other["wall_time"] <= entry["wall_time"]
+            and (other["fitness"] > entry["fitness"]
+                 or other["wall_time"] < entry["wall_time"])
+            for other in summary)
+    summary.sort(key=lambda entry: entry["fitness"], reverse=True)
+    return summary
+
+def print_summary(summary):
+    print("Pareto front, fitness against wall time:")
+    for entry in summary:
+        if not entry["pareto"]:
+            continue
+        to_target = entry["time_to_target"]
+        print({name: entry[name] for name in sweep_params},
+              "runs", entry["runs"],
+              "fitness", round(entry["fitness"], 1),
+              "time", round(entry["wall_time"], 2),
+              "to target", None if to_target is None else round(to_target, 2),
+              "reached", round(entry["reached"], 2),
+              "evals/s", round(entry["evals_per_sec"]))
+
+if __name__ == "__main__":
+    schedule_file = sys.argv[1] if len(sys.argv) > 1 else "SCHEDULE.txt"
+    run_sweep(grid_points(sweep_grid), schedule_file)
+    print_summary(summarize(schedule_file))